@@ -3,15 +3,20 @@ Module contains code that deals with playing audio in voice channels.
 """
 
 import logging
+import os
 from typing import cast
 
 import hikari
+import lavalink
 import lightbulb
+import miru
 
 from src.lavaclient import get_music_client
+from src.queueview import PAGE_SIZE, QueueView
 
 logger = logging.getLogger(__name__)
 music = lightbulb.Group("music", "music commands")
+miru_client: miru.Client | None = None
 
 
 def get_app_from_context(ctx: lightbulb.Context) -> hikari.GatewayBot:
@@ -21,6 +26,17 @@ def get_app_from_context(ctx: lightbulb.Context) -> hikari.GatewayBot:
     return cast(hikari.GatewayBot, ctx.client.app)
 
 
+def get_miru_client(app: hikari.GatewayBot) -> miru.Client:
+    """
+    Get or create the miru client used for the interactive music views.
+    """
+    global miru_client
+
+    if miru_client is None:
+        miru_client = miru.Client(app)
+    return miru_client
+
+
 def safe_guild_id(ctx: lightbulb.Context) -> int:
     """
     Helper function to safely get guild ID as int.
@@ -90,12 +106,13 @@ class Play(
                     return
 
             await ctx.respond("🔍 Searching for tracks...")  # Search for tracks
-            tracks = await music_client.search_tracks(self.query)
+            results = await music_client.load(self.query)
+            tracks = results.tracks if results else None
             if not tracks:
                 # Check if there's nothing playing and no queue
                 if not await music_client.is_playing(
                     guild_id
-                ) and not music_client.get_queue(guild_id):
+                ) and not await music_client.get_queue(guild_id):
                     # Disconnect from voice channel since there's nothing to do
                     await music_client.disconnect_from_voice(guild_id)
                     await ctx.respond(
@@ -106,11 +123,18 @@ class Play(
                     await ctx.respond(f"❌ No tracks found for query: `{self.query}`")
                 return
 
-            # Play the first track
-            track = tracks[0]
             requester_id = ctx.user.id
             requester_name = ctx.user.display_name or ctx.user.username
 
+            if results.load_type == lavalink.LoadType.PLAYLIST and len(tracks) > 1:
+                await self.play_playlist(
+                    ctx, music_client, guild_id, results, requester_id, requester_name
+                )
+                return
+
+            # Play the first track
+            track = tracks[0]
+
             success = await music_client.play_track(
                 guild_id, track, requester_id, requester_name
             )
@@ -140,6 +164,50 @@ class Play(
             logger.error(f"Error in play command: {e}")
             await ctx.respond("❌ An unexpected error occurred.")
 
+    async def play_playlist(
+        self,
+        ctx: lightbulb.Context,
+        music_client,
+        guild_id: int,
+        results: lavalink.LoadResult,
+        requester_id: int,
+        requester_name: str,
+    ) -> None:
+        """
+        Start a playlist and reply with a single summary.
+        The rest of the playlist is queued in the background.
+        """
+        max_tracks = int(os.getenv("PLAYLIST_MAX_TRACKS", "500"))
+        tracks = results.tracks[:max_tracks]
+        was_playing = await music_client.is_playing(guild_id)
+
+        if not await music_client.play_playlist(
+            guild_id, tracks, requester_id, requester_name
+        ):
+            await ctx.respond("❌ Failed to play the playlist.")
+            return
+
+        total_minutes = sum(track.duration for track in tracks) // 60000
+        if total_minutes >= 60:
+            duration_str = f"{total_minutes // 60}h {total_minutes % 60}m"
+        else:
+            duration_str = f"{total_minutes}m"
+
+        first = tracks[0]
+        first_line = (
+            f"🎵 **Added to queue:** {first.title} by {first.author}"
+            if was_playing
+            else f"🎵 **Now playing:** {first.title} by {first.author}"
+        )
+        lines = [
+            f"📃 **Queued playlist:** {results.playlist_info.name} ({len(tracks)} tracks, {duration_str})",
+            first_line,
+        ]
+        if len(results.tracks) > max_tracks:
+            lines.append(f"⚠️ Only the first {max_tracks} tracks were added.")
+        lines.append(f"👤 Requested by {requester_name}")
+        await ctx.respond("\n".join(lines))
+
 
 @music.register
 class Pause(
@@ -347,61 +415,15 @@ class Queue(
                 await ctx.respond("📜 The queue is empty.")
                 return
 
-            # Build queue display
-            embed = hikari.Embed(title="🎵 Music Queue", color=hikari.Color(0x3498DB))
-
-            # Current track
-            if current_track:
-                duration_minutes = current_track.duration // 60000
-                duration_seconds = (current_track.duration % 60000) // 1000
-                duration_str = f"{duration_minutes}:{duration_seconds:02d}"
-
-                status = (
-                    "⏸️ Paused"
-                    if await music_client.is_paused(guild_id)
-                    else "▶️ Playing"
-                )
-                embed.add_field(
-                    name=f"{status} - Now Playing",
-                    value=f"**{current_track.title}** by {current_track.author} [{duration_str}]",
-                    inline=False,
-                )
-
-            # Queue
-            if queue:
-                queue_text = ""
-                for i, queue_track in enumerate(queue[:10]):  # Show first 10 tracks
-                    track = queue_track.track
-                    duration_minutes = track.duration // 60000
-                    duration_seconds = (track.duration % 60000) // 1000
-                    duration_str = f"{duration_minutes}:{duration_seconds:02d}"
-
-                    queue_text += f"`{i + 1}.` **{track.title}** by {track.author} [{duration_str}]\n"
-                    queue_text += f"     👤 {queue_track.requester_name}\n"
-
-                if len(queue) > 10:
-                    queue_text += f"\n... and {len(queue) - 10} more tracks"
-
-                embed.add_field(
-                    name=f"📜 Up Next ({len(queue)} tracks)",
-                    value=queue_text,
-                    inline=False,
-                )
-
-                # Calculate total duration
-                total_duration = sum(qt.track.duration for qt in queue)
-                total_minutes = total_duration // 60000
-                total_hours = total_minutes // 60
-                total_minutes %= 60
-
-                if total_hours > 0:
-                    duration_display = f"{total_hours}h {total_minutes}m"
-                else:
-                    duration_display = f"{total_minutes}m"
-
-                embed.set_footer(text=f"Total queue duration: {duration_display}")
+            view = QueueView(music_client, guild_id, queue)
+            embed = await view.build_embed()
+            if len(queue) <= PAGE_SIZE:
+                await ctx.respond(embed=embed)
+                return
 
-            await ctx.respond(embed=embed)
+            response_id = await ctx.respond(embed=embed, components=view)
+            message = await ctx.fetch_response(response_id)
+            get_miru_client(app).start_view(view, bind_to=message)
 
         except Exception as e:
             logger.error(f"Error in queue command: {e}")
@@ -0,0 +1,88 @@
+"""
+This module works out which gateway intents and cache components the bot
+needs, based on which modules are enabled.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import hikari
+from hikari.api import CacheComponents
+from hikari.impl import CacheSettings
+
+
+@dataclass(frozen=True)
+class ModuleProfile:
+    """
+    Gateway intents a module receives events through, and cache components
+    it reads from.
+    """
+
+    intents: hikari.Intents = hikari.Intents.NONE
+    cache: CacheComponents = CacheComponents.NONE
+
+
+# Needed whatever is enabled: guild events carry the initial voice states,
+# and get_me() reads the bot's own user from the cache.
+BASE_PROFILE = ModuleProfile(intents=hikari.Intents.GUILDS, cache=CacheComponents.ME)
+
+MODULE_PROFILES: dict[str, ModuleProfile] = {
+    # Looks up the caller's voice channel and counts listeners for the
+    # player reaper
+    "audio": ModuleProfile(
+        intents=hikari.Intents.GUILD_VOICE_STATES,
+        cache=CacheComponents.VOICE_STATES,
+    ),
+    # Replies to mentions and explains messages reacted to with a question
+    # mark, reading message content from the events
+    "chat": ModuleProfile(
+        intents=hikari.Intents.GUILD_MESSAGES
+        | hikari.Intents.MESSAGE_CONTENT
+        | hikari.Intents.GUILD_MESSAGE_REACTIONS,
+    ),
+    # Slash commands only
+    "images": ModuleProfile(),
+    "rolling": ModuleProfile(),
+    "scheduling": ModuleProfile(),
+}
+
+
+def build_profile(modules: Iterable[str]) -> tuple[hikari.Intents, CacheSettings]:
+    """
+    Combine the profiles of the enabled modules into the intents and cache
+    settings to start the bot with.
+    """
+    intents = BASE_PROFILE.intents
+    components = BASE_PROFILE.cache
+    for module in modules:
+        profile = MODULE_PROFILES[module]
+        intents |= profile.intents
+        components |= profile.cache
+
+    settings = CacheSettings(
+        components=components,
+        max_messages=300 if components & CacheComponents.MESSAGES else 0,
+        max_dm_channel_ids=50 if components & CacheComponents.DM_CHANNEL_IDS else 0,
+    )
+    return intents, settings
+
+
+def resident_cache_sizes(cache: hikari.api.Cache) -> dict[str, int]:
+    """
+    Number of entries currently held in each part of the cache.
+    """
+    return {
+        "guilds": len(cache.get_guilds_view()),
+        "channels": len(cache.get_guild_channels_view()),
+        "roles": len(cache.get_roles_view()),
+        "emojis": len(cache.get_emojis_view()),
+        "members": sum(len(members) for members in cache.get_members_view().values()),
+        "presences": sum(
+            len(presences) for presences in cache.get_presences_view().values()
+        ),
+        "voice_states": sum(
+            len(states) for states in cache.get_voice_states_view().values()
+        ),
+        "messages": len(cache.get_messages_view()),
+        "users": len(cache.get_users_view()),
+    }
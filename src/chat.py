@@ -6,14 +6,40 @@ Module contains code that deals with generating text responses using an LLM.
 import logging
 import os
 import random
-from collections import deque
+import re
+from collections.abc import AsyncIterator, Hashable
 
 from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.models import infer_model
 
-from src.constants import LLM_SYSTEM_MESSAGES, SNARKY_COMMENTS
+from src.chathistory import ChannelHistories, message_text
+from src.constants import LLM_SYSTEM_MESSAGES, REPLY_ERROR, SNARKY_COMMENTS
+from src.explanationcache import ExplanationCache, explanation_key, settings_fingerprint
+from src.hedging import HedgedRunner
+from src.llmscheduler import (
+    EXPLANATION_PRIORITY,
+    MENTION_PRIORITY,
+    SUMMARY_PRIORITY,
+    LLMScheduler,
+)
 
 logger = logging.getLogger(__name__)
 
+SUMMARY_INSTRUCTIONS = (
+    "You keep a short running summary of a group chat with Dolores, a Discord "
+    "bot. Given the summary so far and the messages that followed it, write "
+    "an updated summary in a few sentences. Keep names, facts and anything "
+    "Dolores promised. Reply with the summary only."
+)
+
+# Start of each numbered reply in an answer to a batch of messages
+BATCH_REPLY_RE = re.compile(r"^\s*\[(\d+)\]\s*", re.MULTILINE)
+
+# Returned by generate_explanation when the LLM call fails
+EXPLANATION_ERROR = "I'm sorry, I encountered an error while generating an explanation."
+EXPLANATION_PROMPT = "Please explain the following message in a simpler, more informative way, as if for someone who might not understand the context or jargon: '{message}'"
+
 
 class chat:
     """
@@ -21,12 +47,46 @@ class chat:
     """
 
     def __init__(self):
-        self.message_history = deque(maxlen=10)
+        # Every LLM request waits its turn here, so bursts queue up instead
+        # of tripping the provider's rate limits
+        self.scheduler = LLMScheduler(
+            max_concurrent=int(os.getenv("LLM_MAX_CONCURRENT", "4")),
+            rate=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60")) / 60,
+            burst=int(os.getenv("LLM_BURST", "10")),
+        )
+        # LLM_MODEL is an ordered list, later models back up slow or failing
+        # earlier ones
+        self.models = [
+            infer_model(name.strip())  # type: ignore
+            for name in os.environ["LLM_MODEL"].split(",")
+            if name.strip()
+        ]
+        self.hedger = HedgedRunner(
+            self.models,
+            percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+            initial_delay=float(os.getenv("LLM_HEDGE_DELAY", "10")),
+            scheduler=self.scheduler,
+        )
+        summary_tokens = int(os.getenv("CHAT_SUMMARY_TOKENS", "0"))
+        self.history = ChannelHistories(
+            max_per_channel=int(os.getenv("CHAT_HISTORY_LENGTH", "10")),
+            max_total=int(os.getenv("CHAT_HISTORY_BUDGET", "2000")),
+            max_tokens=int(os.getenv("CHAT_HISTORY_TOKENS", "1000")),
+            summarizer=self.summarize_history if summary_tokens > 0 else None,
+        )
+        self.summary_agent = Agent(
+            name="Summarizer",
+            model=self.models[0],
+            instructions=SUMMARY_INSTRUCTIONS,
+            model_settings={"temperature": 0.0, "max_tokens": summary_tokens},
+        )
 
         self.dol_agent = Agent(
             name="Dolores",
-            model=os.environ["LLM_MODEL"],  # type: ignore
-            system_prompt=LLM_SYSTEM_MESSAGES,
+            model=self.models[0],
+            # Instructions are sent with every request, unlike a system prompt
+            # which would only be in the oldest message of trimmed history
+            instructions=LLM_SYSTEM_MESSAGES,
             model_settings={
                 "frequency_penalty": float(os.environ.get("FREQUENCY_PENALTY", 0.0)),
                 "presence_penalty": float(os.environ.get("PRESENCE_PENALTY", 0.6)),
@@ -36,70 +96,210 @@ class chat:
             },
         )
 
-    async def generate_reply(self, person: str, message: str) -> str:
+        self.explanations = ExplanationCache(
+            max_size=int(os.getenv("EXPLANATION_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("EXPLANATION_CACHE_TTL", "604800")),
+            path=os.getenv("EXPLANATION_CACHE_PATH"),
+            max_rows=int(os.getenv("EXPLANATION_CACHE_ROWS", "10000")),
+        )
+        self.explanation_fingerprint = settings_fingerprint(
+            os.environ["LLM_MODEL"], EXPLANATION_PROMPT, self.dol_agent.model_settings
+        )
+
+    async def generate_reply(
+        self, person: str, message: str, channel_id: Hashable, user_id: Hashable
+    ) -> str:
         """
         Generates a reply to a given message
 
         :param person: The person who sent the message (Note: pydantic_ai doesn't directly use this 'person' param in history yet)
         :param message: The message to reply to
+        :param channel_id: The channel whose conversation history to use
+        :param user_id: Discord ID of the person, their place in the LLM queue
         :return: The generated reply text
         """
         reply_text = ""
         try:
-            # Pass the current history (list of ModelMessage objects)
-            run = await self.dol_agent.run(
-                user_prompt=message, message_history=list(self.message_history)
-            )
-            reply_text = run.data  # Get the primary text response
+            async with self.scheduler.slot(MENTION_PRIORITY, user_id):
+                # A copy of the channel's history, the list is live and
+                # hedged calls may still be reading it after it changes
+                history = list(self.history.get(channel_id))
+                run = await self.hedger.run(
+                    lambda model: self.dol_agent.run(
+                        user_prompt=message, message_history=history, model=model
+                    )
+                )
+            reply_text = run.output  # Get the primary text response
             logger.info(f"Reply generated: {reply_text}")
 
             # Update history with the new messages from this run
             # run.new_messages() typically contains [UserPromptPart(...), TextPart(...)]
-            new_messages = run.new_messages()
-            self.message_history.extend(new_messages)
+            self.history.extend(channel_id, run.new_messages())
 
         except Exception as e:
             logger.error(f"Error generating reply: {e}")
             # Log history if error occurs (history contains ModelMessage objects now)
-            logger.error(f"Current message history: {list(self.message_history)}")
-            reply_text = "I'm sorry, I encountered an error while generating a reply."
+            logger.error(f"Current message history: {self.history.get(channel_id)}")
+            reply_text = REPLY_ERROR
 
         return reply_text
 
-    async def generate_explanation(self, person: str, message: str) -> str:
+    async def generate_batch_reply(
+        self, messages: list[tuple[str, str]], channel_id: Hashable
+    ) -> list[str] | str:
+        """
+        Generates replies to several messages that arrived at once with a
+        single LLM call.
+
+        :param messages: (person, message) pairs, in the order they were sent
+        :param channel_id: The channel whose conversation history to use
+        :return: One reply per message, REPLY_ERROR if the call failed, or
+            the whole reply if the model didn't answer each message
+            separately. That reply is left out of the history, the caller
+            is expected to answer the messages one at a time instead.
+        """
+        numbered = "\n".join(
+            f"[{i}] {person}: {message}"
+            for i, (person, message) in enumerate(messages, 1)
+        )
+        batch_prompt = (
+            "Several people messaged you at once. Reply to each message separately, "
+            "starting each reply on its own line with the message's number in "
+            f"square brackets, like [1].\n{numbered}"
+        )
+        max_tokens = int(os.environ.get("MAX_TOKENS", 150)) * len(messages)
+
+        try:
+            # Several people share this one, so it counts against the channel,
+            # under a key of its own so it doesn't take a user's turn
+            async with self.scheduler.slot(MENTION_PRIORITY, ("channel", channel_id)):
+                history = list(self.history.get(channel_id))
+                run = await self.hedger.run(
+                    lambda model: self.dol_agent.run(
+                        user_prompt=batch_prompt,
+                        message_history=history,
+                        model_settings={"max_tokens": max_tokens},
+                        model=model,
+                    )
+                )
+            reply_text = run.output
+            logger.info(f"Batch reply generated: {reply_text}")
+        except Exception as e:
+            logger.error(f"Error generating batch reply: {e}")
+            return REPLY_ERROR
+
+        parts = BATCH_REPLY_RE.split(reply_text)
+        replies = {
+            int(number): text.strip() for number, text in zip(parts[1::2], parts[2::2])
+        }
+        if not all(replies.get(i) for i in range(1, len(messages) + 1)):
+            return reply_text
+        self.history.extend(channel_id, run.new_messages())
+        return [replies[i] for i in range(1, len(messages) + 1)]
+
+    async def stream_reply(
+        self, person: str, message: str, channel_id: Hashable, user_id: Hashable
+    ) -> AsyncIterator[str]:
+        """
+        Generates a reply like generate_reply, but yields the text generated
+        so far each time more of it arrives. Models are hedged on how soon
+        their first text arrives, and a model that fails before then hands
+        over to the next. History is only updated once the whole reply has
+        been generated. Errors are left to the caller.
+
+        :param person: The person who sent the message
+        :param message: The message to reply to
+        :param channel_id: The channel whose conversation history to use
+        :param user_id: Discord ID of the person, their place in the LLM queue
+        """
+        text = ""
+        # Only the stream that wins the race gets to the end
+        finished = []
+
+        async def attempt(model):
+            async with self.dol_agent.run_stream(
+                user_prompt=message, message_history=history, model=model
+            ) as run:
+                async for text in run.stream_text(debounce_by=0.1):
+                    yield text
+                finished.append(run)
+
+        async with self.scheduler.slot(MENTION_PRIORITY, user_id):
+            history = list(self.history.get(channel_id))
+            async for text in self.hedger.stream(attempt):
+                yield text
+        logger.info(f"Reply generated: {text}")
+        self.history.extend(channel_id, finished[0].new_messages())
+
+    async def generate_explanation(
+        self, person: str, message: str, channel_id: Hashable, user_id: Hashable
+    ) -> str:
         """
-        Generates a simpler more informative explanation to a given message
+        Generates a simpler more informative explanation to a given message.
+        Explanations are cached by message content, so the same text is only
+        ever explained once.
 
         :param person: The person who sent the message (Note: pydantic_ai doesn't directly use this 'person' param in history yet)
         :param message: The message to explain
+        :param channel_id: The channel whose conversation history to use
+        :param user_id: Discord ID of whoever asked for the explanation, their
+            place in the LLM queue
         :return: The generated explanation text
         """
+        key = explanation_key(message, self.explanation_fingerprint)
+        cached = await self.explanations.get(key)
+        if cached is not None:
+            logger.info(f"Explanation found in cache: {cached}")
+            return cached
+
         explanation_text = ""
-        explanation_prompt = f"Please explain the following message in a simpler, more informative way, as if for someone who might not understand the context or jargon: '{message}'"
+        explanation_prompt = EXPLANATION_PROMPT.format(message=message)
 
         try:
-            # Pass the current history (list of ModelMessage objects)
-            run = await self.dol_agent.run(
-                user_prompt=explanation_prompt,
-                message_history=list(self.message_history),
-            )
-            explanation_text = run.data
+            async with self.scheduler.slot(EXPLANATION_PRIORITY, user_id):
+                # Copied for the same reason as in generate_reply
+                history = list(self.history.get(channel_id))
+                run = await self.hedger.run(
+                    lambda model: self.dol_agent.run(
+                        user_prompt=explanation_prompt,
+                        message_history=history,
+                        model=model,
+                    )
+                )
+            explanation_text = run.output
             logger.info(f"Explanation generated: {explanation_text}")
 
             # Update history with the new messages from this run
-            new_messages = run.new_messages()
-            self.message_history.extend(new_messages)
+            self.history.extend(channel_id, run.new_messages())
+            if explanation_text:
+                await self.explanations.put(key, explanation_text)
 
         except Exception as e:
             logger.error(f"Error generating explanation: {e}")
             # Log history if error occurs (history contains ModelMessage objects now)
-            logger.error(f"Current message history: {list(self.message_history)}")
-            explanation_text = (
-                "I'm sorry, I encountered an error while generating an explanation."
-            )
+            logger.error(f"Current message history: {self.history.get(channel_id)}")
+            explanation_text = EXPLANATION_ERROR
 
         return explanation_text  # Return the extracted text
 
+    async def summarize_history(
+        self, summary: str | None, messages: list[ModelMessage]
+    ) -> str:
+        """
+        Folds messages trimmed from a channel's history into its summary.
+        Runs in the background, never while someone waits on a reply.
+
+        :param summary: The summary so far, if any
+        :param messages: The messages to add to it, oldest first
+        :return: The updated summary
+        """
+        transcript = "\n".join(filter(None, map(message_text, messages)))
+        prompt = f"Summary so far: {summary or 'None'}\n\nMessages:\n{transcript}"
+        async with self.scheduler.slot(SUMMARY_PRIORITY, None):
+            run = await self.summary_agent.run(user_prompt=prompt)
+        logger.debug(f"Chat history summary: {run.output}")
+        return run.output
+
     async def generate_snarky_comment(self) -> str:
         """
         Generates a snarky comment to be used when a user tries to
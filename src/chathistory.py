@@ -0,0 +1,233 @@
+"""
+This module keeps LLM conversation history separately for each channel.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    SystemPromptPart,
+    TextPart,
+    UserPromptPart,
+)
+
+logger = logging.getLogger(__name__)
+
+# Rough token count for English text, close enough for budgeting without
+# pulling in each provider's tokenizer
+CHARS_PER_TOKEN = 4
+# Role markers and formatting each message costs on top of its text
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Folds older messages into an existing summary, returning the new summary
+Summarizer = Callable[[str | None, list[ModelMessage]], Awaitable[str]]
+
+
+def message_text(message: ModelMessage) -> str:
+    """
+    The text of a message's prompt and reply parts, one part per line.
+    """
+    lines = []
+    for part in message.parts:
+        if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+            lines.append(f"User: {part.content}")
+        elif isinstance(part, TextPart):
+            lines.append(f"Dolores: {part.content}")
+    return "\n".join(lines)
+
+
+def estimate_tokens(message: ModelMessage) -> int:
+    """
+    Approximate number of prompt tokens a message takes up.
+    """
+    chars = 0
+    for part in message.parts:
+        content = getattr(part, "content", "")
+        chars += len(content) if isinstance(content, str) else len(str(content))
+    return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+class _Channel:
+    """
+    History of one channel, with the token estimate of each message.
+    """
+
+    def __init__(self):
+        self.messages: list[ModelMessage] = []
+        self.tokens: list[int] = []
+        self.summary: str | None = None
+        self.unsummarized: list[ModelMessage] = []
+        self.summarizing: asyncio.Task | None = None
+
+    def trim(self, count: int) -> list[ModelMessage]:
+        """
+        Drop the oldest count messages, and any responses left at the front
+        without their prompt. Returns the dropped messages.
+        """
+        while count < len(self.messages) and not isinstance(
+            self.messages[count], ModelRequest
+        ):
+            count += 1
+        dropped = self.messages[:count]
+        del self.messages[:count]
+        del self.tokens[:count]
+        return dropped
+
+
+class ChannelHistories:
+    """
+    Conversation history per channel (threads are channels too), so that
+    conversations in different places don't bleed into each other.
+
+    Each channel keeps at most max_per_channel messages and max_tokens
+    estimated tokens, dropping the oldest first, so prompts stay the same
+    size however long a channel talks for. The newest exchange is always
+    kept. Across all channels at most max_total messages are kept; once over
+    that, the channels that have gone quiet the longest are dropped entirely.
+
+    With a summarizer, messages trimmed from a channel are folded into a
+    rolling summary of that channel in the background, and the summary is
+    sent ahead of the remaining history.
+    """
+
+    def __init__(
+        self,
+        max_per_channel: int,
+        max_total: int,
+        max_tokens: int,
+        summarizer: Summarizer | None = None,
+    ):
+        self.max_per_channel = max_per_channel
+        self.max_total = max_total
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.total: int = 0
+        self.evictions: int = 0
+        self.trimmed: int = 0
+        self.summaries: int = 0
+        self._channels: OrderedDict[Hashable, _Channel] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def get(self, channel_id: Hashable) -> list[ModelMessage]:
+        """
+        History for a channel, oldest first. Not copied unless there is a
+        summary to put in front, so don't modify it.
+        """
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            return []
+        self._channels.move_to_end(channel_id)
+        if channel.summary is None:
+            return channel.messages
+        summary = ModelRequest(
+            parts=[
+                SystemPromptPart(
+                    f"Summary of the earlier conversation here: {channel.summary}"
+                )
+            ]
+        )
+        return [summary, *channel.messages]
+
+    def tokens(self, channel_id: Hashable) -> int:
+        """
+        Estimated tokens in a channel's history, not counting its summary.
+        """
+        channel = self._channels.get(channel_id)
+        return sum(channel.tokens) if channel else 0
+
+    def extend(self, channel_id: Hashable, messages: Iterable[ModelMessage]) -> None:
+        """
+        Add the messages from a run to a channel's history.
+        """
+        messages = list(messages)
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            channel = self._channels[channel_id] = _Channel()
+        self._channels.move_to_end(channel_id)
+        before = len(channel.messages)
+        channel.messages.extend(messages)
+        channel.tokens.extend(estimate_tokens(message) for message in messages)
+
+        # Work out how many of the oldest messages have to go, never
+        # including the ones just added
+        droppable = len(channel.messages) - len(messages)
+        excess = len(channel.messages) - self.max_per_channel
+        tokens = sum(channel.tokens)
+        count = 0
+        while count < droppable and (count < excess or tokens > self.max_tokens):
+            tokens -= channel.tokens[count]
+            count += 1
+        if count:
+            dropped = channel.trim(count)
+            self.trimmed += len(dropped)
+            self._summarize(channel, dropped)
+        self.total += len(channel.messages) - before
+
+        while self.total > self.max_total and len(self._channels) > 1:
+            evicted_id, evicted = self._channels.popitem(last=False)
+            self.total -= len(evicted.messages)
+            self.evictions += 1
+            if evicted.summarizing:
+                evicted.summarizing.cancel()
+            logger.debug(f"Dropped chat history for idle channel {evicted_id}")
+
+    def _summarize(self, channel: _Channel, dropped: list[ModelMessage]) -> None:
+        """
+        Fold trimmed messages into the channel's summary in the background.
+        Messages trimmed while a summary is being written wait for the next.
+        """
+        if self.summarizer is None:
+            return
+        channel.unsummarized.extend(dropped)
+        if channel.summarizing is None:
+            channel.summarizing = asyncio.create_task(self._run_summarizer(channel))
+
+    async def _run_summarizer(self, channel: _Channel) -> None:
+        try:
+            while channel.unsummarized:
+                pending = channel.unsummarized
+                channel.unsummarized = []
+                try:
+                    channel.summary = await self.summarizer(channel.summary, pending)
+                    self.summaries += 1
+                except Exception as e:
+                    # The messages are lost from history either way
+                    logger.error(f"Error summarizing chat history: {e}")
+        finally:
+            channel.summarizing = None
+
+    def clear(self, channel_id: Hashable) -> None:
+        """
+        Forget a channel's history.
+        """
+        channel = self._channels.pop(channel_id, None)
+        if channel is not None:
+            self.total -= len(channel.messages)
+            if channel.summarizing:
+                channel.summarizing.cancel()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Number of channels and messages held, the largest channel in
+        estimated tokens, and how much has been trimmed and evicted.
+        """
+        return {
+            "channels": len(self._channels),
+            "messages": self.total,
+            "max_per_channel": self.max_per_channel,
+            "max_total": self.max_total,
+            "largest_tokens": max(
+                (sum(channel.tokens) for channel in self._channels.values()),
+                default=0,
+            ),
+            "max_tokens": self.max_tokens,
+            "trimmed": self.trimmed,
+            "summaries": self.summaries,
+            "evictions": self.evictions,
+        }
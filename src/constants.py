@@ -44,3 +44,7 @@ SNARKY_COMMENTS = [
     "No.",
     "Big Dumb.",
 ]
+
+# Returned in place of a reply when the LLM call fails. Kept here rather than in
+# chat so the reply streaming code can use it without importing the LLM stack
+REPLY_ERROR = "I'm sorry, I encountered an error while generating a reply."
@@ -0,0 +1,172 @@
+"""
+This module caches LLM explanations by the content of the message they
+explain, optionally backed by a local SQLite database so they survive a
+restart.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from typing import Any
+
+from src.searchcache import SearchCache
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS explanations (
+    key TEXT PRIMARY KEY,
+    explanation TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS explanations_created_at ON explanations (created_at);
+"""
+
+
+def explanation_key(content: str, fingerprint: str) -> str:
+    """
+    Hash of a message's content and the model settings used to explain it.
+    Case and whitespace differences don't change the key.
+    """
+    normalized = " ".join(content.split()).casefold()
+    return hashlib.sha256(f"{fingerprint}\0{normalized}".encode()).hexdigest()
+
+
+def settings_fingerprint(
+    model: str, prompt: str, settings: dict[str, Any] | None
+) -> str:
+    """
+    Stable string for the model, prompt template and settings, so that
+    changing any of them stops old explanations from being reused.
+    """
+    return json.dumps(
+        {"model": model, "prompt": prompt, "settings": settings or {}}, sort_keys=True
+    )
+
+
+class ExplanationCache:
+    """
+    An in-memory LRU of explanations in front of an optional SQLite table.
+
+    Lookups check memory first and only go to disk on a miss, promoting
+    what they find there. Both tiers drop entries older than the TTL, and
+    the table is pruned to its newest max_rows entries on every write.
+    Database calls run in threads; close() stops new ones and waits for
+    those already running before closing the connection.
+    """
+
+    def __init__(
+        self, max_size: int, ttl: float, path: str | None = None, max_rows: int = 10000
+    ):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory = SearchCache(max_size=max_size, ttl=ttl)
+        self.disk_hits: int = 0
+        self.misses: int = 0
+        self.pruned: int = 0
+        self._conn: sqlite3.Connection | None = None
+        self._disk_calls: set[asyncio.Future] = set()
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            with self._conn:
+                self._prune(self._conn)
+
+    async def get(self, key: str) -> str | None:
+        """
+        The cached explanation for key, or None.
+        """
+        explanation = self.memory.get(key)
+        if explanation is not None:
+            return explanation
+
+        if self._conn is not None:
+            explanation = await self._on_disk(self._read, key)
+            if explanation is not None:
+                self.disk_hits += 1
+                self.memory.put(key, explanation)
+                return explanation
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, explanation: str) -> None:
+        """
+        Store an explanation in memory, and on disk if enabled.
+        """
+        self.memory.put(key, explanation)
+        if self._conn is not None:
+            try:
+                await self._on_disk(self._write, key, explanation)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to save explanation: {e}")
+
+    async def _on_disk(self, call, *args):
+        """
+        Run a database call in a thread, or return None once closing.
+        The call is shielded so it is still tracked, and waited for by
+        close(), if the caller is cancelled while the thread runs.
+        """
+        if self._conn is None:
+            return None
+        future = asyncio.ensure_future(asyncio.to_thread(call, self._conn, *args))
+        self._disk_calls.add(future)
+        future.add_done_callback(self._disk_calls.discard)
+        return await asyncio.shield(future)
+
+    def _read(self, conn: sqlite3.Connection, key: str) -> str | None:
+        row = conn.execute(
+            "SELECT explanation FROM explanations WHERE key = ? AND created_at > ?",
+            (key, time.time() - self.ttl),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _write(self, conn: sqlite3.Connection, key: str, explanation: str) -> None:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO explanations (key, explanation, created_at) "
+                "VALUES (?, ?, ?)",
+                (key, explanation, time.time()),
+            )
+            self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """
+        Delete expired rows and all but the newest max_rows.
+        """
+        deleted = conn.execute(
+            "DELETE FROM explanations WHERE created_at <= ? OR key IN "
+            "(SELECT key FROM explanations ORDER BY created_at DESC, rowid DESC "
+            "LIMIT -1 OFFSET ?)",
+            (time.time() - self.ttl, self.max_rows),
+        ).rowcount
+        self.pruned += deleted
+
+    async def close(self) -> None:
+        """
+        Wait for running database calls, then close the database.
+        """
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        await asyncio.gather(*self._disk_calls, return_exceptions=True)
+        conn.close()
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Memory tier counters plus disk hits and overall hit rate.
+        """
+        memory = self.memory.stats()
+        hits = memory["hits"] + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            **memory,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "pruned": self.pruned,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
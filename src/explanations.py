@@ -0,0 +1,182 @@
+"""
+This module answers question mark reactions with an explanation of the
+message that was reacted to.
+"""
+
+import asyncio
+import logging
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+
+import hikari
+
+from src.chat import EXPLANATION_ERROR, chat
+from src.messagefilter import sanitize_author
+from src.searchcache import SearchCache
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedMessage:
+    """
+    The parts of a message needed to explain it.
+    """
+
+    content: str
+    author: str | None
+
+
+def message_from_payload(payload: Mapping[str, Any]) -> CachedMessage | None:
+    """
+    Pull the content and author name out of a raw message payload.
+    """
+    content = payload.get("content")
+    author = payload.get("author")
+    if not content or not author:
+        return None
+    member = payload.get("member") or {}
+    name = member.get("nick") or author.get("global_name") or author.get("username")
+    return CachedMessage(content, name)
+
+
+class ExplanationService:
+    """
+    Explains messages for question mark reactions.
+
+    Message content is kept in a bounded cache fed from gateway events, so a
+    reaction usually needs no REST call to find out what was said. Reactions
+    that arrive while an explanation for the same message is still being
+    generated wait for that one instead of starting their own, and
+    reactions to a message that has already been answered are ignored
+    rather than posting the same answer again. Finished explanations are
+    also cached by chat, keyed on the message content, so identical messages
+    elsewhere don't need another LLM call.
+    """
+
+    def __init__(self, bot: hikari.GatewayBot, chat_inst: chat):
+        self.bot = bot
+        self.chat = chat_inst
+        self.messages = SearchCache(
+            max_size=int(os.getenv("MESSAGE_CACHE_SIZE", "2000")),
+            ttl=float(os.getenv("MESSAGE_CACHE_TTL", "86400")),
+        )
+        # Explanations already posted, by the ID of the message they explain
+        self.answered = SearchCache(
+            max_size=int(os.getenv("MESSAGE_CACHE_SIZE", "2000")),
+            ttl=float(os.getenv("MESSAGE_CACHE_TTL", "86400")),
+        )
+        self.fetched: int = 0
+        self.joined: int = 0
+        self.repeats: int = 0
+        self._inflight: dict[int, asyncio.Task] = {}
+
+    def observe(self, name: str, payload: Mapping[str, Any]) -> None:
+        """
+        Keep the message cache up to date from a raw gateway event.
+        """
+        if name == "MESSAGE_CREATE":
+            message = message_from_payload(payload)
+            if message:
+                self.messages.put(int(payload["id"]), message)
+        elif name == "MESSAGE_UPDATE":
+            # Updates without content are embed unfurls, nothing changed
+            message_id = int(payload["id"])
+            if "content" in payload and message_id in self.messages:
+                message = message_from_payload(payload)
+                if message:
+                    self.messages.put(message_id, message)
+                else:
+                    self.messages.discard(message_id)
+            if "content" in payload:
+                # An edited message can be explained again
+                self.answered.discard(message_id)
+        elif name == "MESSAGE_DELETE":
+            self.messages.discard(int(payload["id"]))
+            self.answered.discard(int(payload["id"]))
+        elif name == "MESSAGE_DELETE_BULK":
+            for message_id in payload["ids"]:
+                self.messages.discard(int(message_id))
+                self.answered.discard(int(message_id))
+
+    async def answer(self, channel_id: int, message_id: int, user_id: int) -> None:
+        """
+        Reply to a message with an explanation of it, unless it already has one.
+        user_id is whoever reacted, and is who the LLM request is charged to.
+        """
+        if message_id in self.answered:
+            self.repeats += 1
+            return
+        task = self._inflight.get(message_id)
+        if task is not None:
+            # Someone else's reaction is already getting this one answered
+            self.joined += 1
+            await asyncio.shield(task)
+            return
+
+        task = asyncio.create_task(self._explain(channel_id, message_id, user_id))
+        self._inflight[message_id] = task
+        task.add_done_callback(lambda _: self._inflight.pop(message_id, None))
+        explanation = await asyncio.shield(task)
+        if not explanation:
+            return
+        if explanation != EXPLANATION_ERROR:
+            # Marked before posting, a reaction arriving meanwhile is a repeat
+            self.answered.put(message_id, explanation)
+        try:
+            await self.bot.rest.create_message(
+                channel_id, explanation, reply=message_id
+            )
+        except hikari.HTTPError:
+            self.answered.discard(message_id)
+            raise
+
+    async def _explain(
+        self, channel_id: int, message_id: int, user_id: int
+    ) -> str | None:
+        message = await self._get_message(channel_id, message_id)
+        if message is None:
+            return None
+
+        author = sanitize_author(message.author)
+        logger.info(f"Generating explanation for message: {message.content}")
+        return await self.chat.generate_explanation(
+            author, message.content, channel_id, user_id
+        )
+
+    async def _get_message(
+        self, channel_id: int, message_id: int
+    ) -> CachedMessage | None:
+        """
+        Look a message up in the cache, fetching it if it isn't there.
+        """
+        message = self.messages.get(message_id)
+        if message is not None:
+            return message
+
+        self.fetched += 1
+        try:
+            fetched = await self.bot.rest.fetch_message(channel_id, message_id)
+        except hikari.HTTPError as e:
+            logger.error(f"Failed to fetch message {message_id}: {e}")
+            return None
+        if not fetched.content:
+            return None
+        message = CachedMessage(fetched.content, fetched.author.display_name)
+        self.messages.put(message_id, message)
+        return message
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Cache counters, REST fallbacks, reactions that shared a request and
+        reactions to messages that were already answered.
+        """
+        return {
+            "messages": self.messages.stats(),
+            "explanations": self.chat.explanations.stats(),
+            "fetched": self.fetched,
+            "joined": self.joined,
+            "repeats": self.repeats,
+        }
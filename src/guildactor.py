@@ -0,0 +1,162 @@
+"""
+This module runs music operations one at a time per guild.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# Guild whose actor is running the current task, so nested calls run inline
+_running_guild: contextvars.ContextVar[int | None] = contextvars.ContextVar(
+    "running_guild", default=None
+)
+
+
+class GuildActor:
+    """
+    A mailbox and worker task for a single guild. Operations are run in the
+    order they were submitted, never two at the same time.
+    """
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.mailbox: asyncio.Queue = asyncio.Queue()
+        # Queued operations by coalescing key, not yet started
+        self.pending: dict[Hashable, asyncio.Future] = {}
+        self.task: asyncio.Task | None = None
+
+
+class GuildActors:
+    """
+    Serializes operations within a guild while different guilds run
+    concurrently. A guild's worker exits once it has been idle for
+    idle_timeout seconds and is recreated on the next operation.
+    """
+
+    def __init__(self, idle_timeout: float = 60.0):
+        self.idle_timeout = idle_timeout
+        self._actors: dict[int, GuildActor] = {}
+        self.coalesced: int = 0
+
+    def __len__(self) -> int:
+        return len(self._actors)
+
+    async def run(
+        self,
+        guild_id: int,
+        operation: Callable[[], Awaitable[Any]],
+        key: Hashable | None = None,
+    ) -> Any:
+        """
+        Run operation on the guild's actor and return its result.
+
+        If key is given and an operation with the same key is already waiting
+        in the mailbox, the caller shares that operation's result instead of
+        queueing a duplicate.
+        """
+        if _running_guild.get() == guild_id:
+            # Already inside this guild's actor, queueing would deadlock
+            return await operation()
+
+        actor = self._actors.get(guild_id)
+        if actor is None:
+            actor = self._actors[guild_id] = GuildActor(guild_id)
+        if actor.task is None or actor.task.done():
+            actor.task = asyncio.create_task(self._work(actor))
+            actor.task.add_done_callback(lambda _: self._abandon(actor))
+
+        if key is not None and key in actor.pending:
+            self.coalesced += 1
+            return await asyncio.shield(actor.pending[key])
+
+        future = asyncio.get_running_loop().create_future()
+        if key is not None:
+            actor.pending[key] = future
+        actor.mailbox.put_nowait((key, operation, future))
+        return await asyncio.shield(future)
+
+    async def _work(self, actor: GuildActor) -> None:
+        _running_guild.set(actor.guild_id)
+        while True:
+            try:
+                key, operation, future = await asyncio.wait_for(
+                    actor.mailbox.get(), self.idle_timeout
+                )
+            except TimeoutError:
+                if actor.mailbox.empty():
+                    # Nothing can be queued between this check and returning
+                    if self._actors.get(actor.guild_id) is actor:
+                        del self._actors[actor.guild_id]
+                    return
+                continue
+
+            if key is not None and actor.pending.get(key) is future:
+                del actor.pending[key]
+            await self._run_operation(operation, future)
+
+    def _abandon(self, actor: GuildActor) -> None:
+        """
+        Cancel whatever is still queued when a worker stops. Idle workers
+        stop with an empty mailbox, so this only matters for workers that
+        were cancelled or hit a fatal error.
+        """
+        while not actor.mailbox.empty():
+            _, _, future = actor.mailbox.get_nowait()
+            future.cancel()
+        actor.pending.clear()
+
+    async def _run_operation(
+        self, operation: Callable[[], Awaitable[Any]], future: asyncio.Future
+    ) -> None:
+        """
+        Run one operation and settle its future however it ends. Only
+        cancellation of the worker itself, or an exception that isn't an
+        Exception, stops the worker.
+        """
+        try:
+            result = await operation()
+        except asyncio.CancelledError:
+            future.cancel()
+            if asyncio.current_task().cancelling():
+                raise
+            logger.warning("A guild operation was cancelled from inside")
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            if not future.done():
+                future.set_result(result)
+        finally:
+            # Nothing above may leave a caller waiting forever
+            future.cancel()
+
+
+def serialized(coalesce: bool = False):
+    """
+    Decorator for async methods that take a guild ID as their first argument,
+    running them on that guild's actor (self.actors).
+
+    With coalesce, a call identical to one that is still waiting to run
+    shares its result instead of being run a second time.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, guild_id: int, *args, **kwargs):
+            key = None
+            if coalesce:
+                key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            return await self.actors.run(
+                guild_id, lambda: method(self, guild_id, *args, **kwargs), key
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,321 @@
+"""
+This module sends LLM requests to backup models when the primary one is
+slower than usual, using whichever answer arrives first.
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+from collections import Counter, defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import TypeVar
+
+from pydantic_ai.models import Model
+
+from src.llmscheduler import LLMScheduler
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Upper bounds of the latency buckets in seconds, roughly 25% apart from
+# 50ms to 2 minutes
+BUCKET_BOUNDS = [0.05 * 1.25**i for i in range(36)]
+
+
+class LatencyHistogram:
+    """
+    Counts of request latencies in fixed, log spaced buckets.
+    """
+
+    def __init__(self):
+        self.counts: list[int] = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total: int = 0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.total += 1
+
+    def percentile(self, p: float) -> float:
+        """
+        Upper bound of the bucket the p-th percentile falls in.
+        """
+        if not self.total:
+            return 0.0
+        target = p * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return BUCKET_BOUNDS[min(index, len(BUCKET_BOUNDS) - 1)]
+        return BUCKET_BOUNDS[-1]
+
+
+class _StreamFailed:
+    """
+    Queued by a stream that failed after its first chunk.
+    """
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+# Queued by a stream once it has finished
+_STREAM_END = object()
+
+
+class HedgedRunner:
+    """
+    Runs a request against an ordered list of models.
+
+    The first model is tried on its own. If it hasn't answered by its usual
+    latency at the configured percentile, the request is also sent to the
+    next model, and so on down the list; a model that fails hands over to
+    the next one straight away. The first answer wins and the rest are
+    cancelled. Until a model has min_samples recorded latencies, initial_delay
+    is used as its threshold instead. Streamed requests race the same way on
+    time to the first chunk, with their own latency histograms.
+
+    The caller holds one scheduler slot for the whole request. Every call
+    made while another is still running needs a slot of its own from
+    scheduler, and is put off while none is free, so hedges stay inside the
+    concurrency cap and rate limit.
+    """
+
+    def __init__(
+        self,
+        models: list[Model],
+        percentile: float,
+        initial_delay: float,
+        min_samples: int = 20,
+        scheduler: LLMScheduler | None = None,
+    ):
+        self.models = models
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.scheduler = scheduler
+        self.histograms: defaultdict[str, LatencyHistogram] = defaultdict(
+            LatencyHistogram
+        )
+        # Time to the first chunk of streamed requests
+        self.first_chunk: defaultdict[str, LatencyHistogram] = defaultdict(
+            LatencyHistogram
+        )
+        self.wins: Counter = Counter()
+        self.failures: Counter = Counter()
+        self.hedges: int = 0
+        self.skipped: int = 0
+
+    def hedge_delay(
+        self,
+        model: Model,
+        histograms: dict[str, LatencyHistogram] | None = None,
+    ) -> float:
+        """
+        How long to give a model before also trying the next one.
+        """
+        histogram = (histograms or self.histograms)[model.model_name]
+        if histogram.total < self.min_samples:
+            return self.initial_delay
+        return histogram.percentile(self.percentile)
+
+    async def _timed(self, model: Model, call: Callable[[Model], Awaitable[T]]) -> T:
+        started = time.perf_counter()
+        try:
+            result = await call(model)
+        except Exception:
+            self.failures[model.model_name] += 1
+            raise
+        self.histograms[model.model_name].record(time.perf_counter() - started)
+        return result
+
+    async def run(self, call: Callable[[Model], Awaitable[T]]) -> T:
+        """
+        Make call(model) against each model in turn as described above, and
+        return the first result. Raises the last error if every model fails.
+        """
+        if len(self.models) == 1:
+            return await self._timed(self.models[0], call)
+
+        def start(model: Model) -> tuple[asyncio.Future, asyncio.Task]:
+            task = asyncio.create_task(self._timed(model, call))
+            return task, task
+
+        _, task = await self._race(start, self.histograms)
+        return task.result()
+
+    async def stream(
+        self, call: Callable[[Model], AsyncIterator[T]]
+    ) -> AsyncIterator[T]:
+        """
+        Like run(), for calls that stream their answer. Models race to their
+        first chunk, so a model that fails before producing anything hands
+        over to the next one. After that the winner's chunks are passed on
+        as they arrive, and an error part way through is raised.
+        """
+        queues: dict[asyncio.Task, asyncio.Queue] = {}
+
+        def start(model: Model) -> tuple[asyncio.Future, asyncio.Task]:
+            first = asyncio.get_running_loop().create_future()
+            queue: asyncio.Queue = asyncio.Queue()
+            task = asyncio.create_task(self._pump(model, call, first, queue))
+            queues[task] = queue
+            return first, task
+
+        if len(self.models) == 1:
+            first, task = start(self.models[0])
+            try:
+                await first
+            except BaseException:
+                task.cancel()
+                raise
+        else:
+            _, task = await self._race(start, self.first_chunk)
+
+        try:
+            while True:
+                item = await queues[task].get()
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, _StreamFailed):
+                    raise item.error
+                yield item
+        finally:
+            task.cancel()
+
+    async def _pump(
+        self,
+        model: Model,
+        call: Callable[[Model], AsyncIterator[T]],
+        first: asyncio.Future,
+        queue: asyncio.Queue,
+    ) -> None:
+        """
+        Read a whole stream into queue, settling first once the first chunk
+        arrives, or with the error if the stream fails before that.
+        """
+        started = time.perf_counter()
+        try:
+            async for chunk in call(model):
+                if not first.done():
+                    self.first_chunk[model.model_name].record(
+                        time.perf_counter() - started
+                    )
+                    first.set_result(None)
+                queue.put_nowait(chunk)
+        except Exception as e:
+            if first.done():
+                queue.put_nowait(_StreamFailed(e))
+            else:
+                self.failures[model.model_name] += 1
+                first.set_exception(e)
+            return
+        except BaseException:
+            # Cancelled, nobody is left waiting on the first chunk
+            first.cancel()
+            raise
+        if not first.done():
+            # An empty answer is still an answer
+            first.set_result(None)
+        queue.put_nowait(_STREAM_END)
+
+    async def _race(
+        self,
+        start: Callable[[Model], tuple[asyncio.Future, asyncio.Task]],
+        histograms: dict[str, LatencyHistogram],
+    ) -> tuple[Model, asyncio.Task]:
+        """
+        Race the models as described above. start(model) begins an attempt,
+        returning a future that settles once the attempt has its answer and
+        the task doing the work. Returns the winning model and its task,
+        having cancelled the others. Raises the last error if every model
+        fails.
+        """
+        remaining = list(self.models)
+        running: dict[asyncio.Future, tuple[Model, asyncio.Task]] = {}
+        error: BaseException | None = None
+        winner: asyncio.Future | None = None
+        try:
+            while True:
+                if remaining and (not running or error is not None):
+                    # Nothing left running, or the last one just failed
+                    if self._start(remaining[0], start, running):
+                        remaining.pop(0)
+                        error = None
+                if not running:
+                    raise error or RuntimeError("No LLM models configured")
+
+                newest = list(running.values())[-1][0]
+                timeout = self.hedge_delay(newest, histograms) if remaining else None
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Slower than usual, try the next model alongside it
+                    if self._start(remaining[0], start, running):
+                        self.hedges += 1
+                        model = remaining.pop(0)
+                        logger.debug(
+                            f"{newest.model_name} slow, hedging with {model.model_name}"
+                        )
+                    else:
+                        self.skipped += 1
+                    continue
+
+                for future in done:
+                    model, task = running[future]
+                    if future.exception() is None:
+                        self.wins[model.model_name] += 1
+                        winner = future
+                        return model, task
+                    del running[future]
+                    error = future.exception()
+                    logger.warning(f"{model.model_name} failed: {error}")
+                if not remaining and not running:
+                    raise error
+        finally:
+            for future, (_, task) in running.items():
+                if future is not winner:
+                    task.cancel()
+
+    def _start(
+        self,
+        model: Model,
+        start: Callable[[Model], tuple[asyncio.Future, asyncio.Task]],
+        running: dict[asyncio.Future, tuple[Model, asyncio.Task]],
+    ) -> bool:
+        """
+        Start an attempt on model unless it needs a scheduler slot and none
+        is free.
+        """
+        extra = bool(running) and self.scheduler is not None
+        if extra and not self.scheduler.try_acquire():
+            return False
+        future, task = start(model)
+        if extra:
+            task.add_done_callback(lambda _: self.scheduler.release())
+        running[future] = (model, task)
+        return True
+
+    def stats(self) -> dict[str, dict[str, int | float]]:
+        """
+        Per model latency percentiles (and time to first chunk for streams),
+        wins and failures, plus hedges sent and hedges put off for lack of a
+        scheduler slot.
+        """
+        names = sorted(self.histograms.keys() | self.first_chunk.keys())
+        stats = {
+            name: {
+                "requests": self.histograms[name].total,
+                "p50": round(self.histograms[name].percentile(0.5), 3),
+                "p95": round(self.histograms[name].percentile(0.95), 3),
+                "streams": self.first_chunk[name].total,
+                "first_chunk_p95": round(self.first_chunk[name].percentile(0.95), 3),
+                "wins": self.wins[name],
+                "failures": self.failures[name],
+            }
+            for name in names
+        }
+        return {**stats, "hedges": {"sent": self.hedges, "skipped": self.skipped}}
@@ -19,7 +19,19 @@ from openai import (
 
 logger = logging.getLogger(__name__)
 loader = lightbulb.Loader()
-async_openai_client = AsyncOpenAI()
+async_openai_client: AsyncOpenAI | None = None
+
+
+def get_openai_client() -> AsyncOpenAI:
+    """
+    Get or create the OpenAI client. Created on first use rather than at
+    import so loading the module stays cheap.
+    """
+    global async_openai_client
+
+    if async_openai_client is None:
+        async_openai_client = AsyncOpenAI()
+    return async_openai_client
 
 
 @loader.command
@@ -43,7 +55,7 @@ class Images(lightbulb.SlashCommand, name="images", description="Generate images
             if style_input == "vivid":
                 style = "vivid"
 
-            response = await async_openai_client.images.generate(
+            response = await get_openai_client().images.generate(
                 prompt=self.prompt,
                 model=os.environ["IMAGE_MODEL"],
                 style=style,
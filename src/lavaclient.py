@@ -5,25 +5,43 @@ This module handles interacting with the lavalink server.
 import asyncio
 import logging
 import os
+import re
 import time
-from dataclasses import dataclass
 
 import hikari
 import lavalink
 
+from src.guildactor import GuildActors, serialized
+from src.multisearch import MultiSourceSearch
+from src.nodepool import NodeConfig, NodePool, parse_nodes
+from src.playerreaper import PlayerReaper
+from src.queuestore import GuildSnapshot, QueueStore, restore_queue
+from src.readiness import ReadinessWaiter
+from src.searchcache import SearchCache
+from src.trackqueue import QueueTrack, TrackQueue
+
 logger = logging.getLogger(__name__)
 
+# Cache key prefix for plain search terms, which are searched on every source
+SEARCH_KEY_PREFIX = "search:"
+# Queries that already name a lavalink source, e.g. "ytsearch:some song"
+SOURCE_PREFIX_RE = re.compile(r"^([a-z]+search):", re.IGNORECASE)
+# Lookups of a queued track that may fail before it is left as it is
+PREFETCH_ATTEMPTS = 3
+# Seconds before retrying a failed lookup, multiplied by the attempt number
+PREFETCH_RETRY_DELAY = 2.0
+
 
-@dataclass
-class QueueTrack:
+class MusicPlayer(lavalink.DefaultPlayer):
     """
-    Represents a track in the queue with additional metadata.
+    A player that leaves moving through the queue to MusicClient.
+    DefaultPlayer reacts to a finished track by playing from its own queue,
+    which is always empty here, so it would send a stop that can land after
+    MusicClient has already started the next track.
     """
 
-    track: lavalink.AudioTrack
-    requester_id: int
-    requester_name: str
-    added_at: float
+    async def handle_event(self, event) -> None:
+        pass
 
 
 class MusicClient:
@@ -34,63 +52,252 @@ class MusicClient:
     def __init__(self, bot: hikari.GatewayBot):
         self.bot = bot
         self.lavalink: lavalink.Client | None = None
-        self.queues: dict[int, list[QueueTrack]] = {}
+        self.node_pool: NodePool | None = None
+        self.queues: dict[int, TrackQueue] = {}
+        self.now_playing: dict[int, QueueTrack] = {}
+        self.queue_store: QueueStore | None = None
+        self.reaper: PlayerReaper | None = None
         self.is_initialized: bool = False
+        self._prefetch_tasks: dict[int, asyncio.Task] = {}
+        self._enqueue_tasks: dict[int, asyncio.Task] = {}
+        self.readiness = ReadinessWaiter()
+        # Music operations run one at a time per guild
+        self.actors = GuildActors()
+        # Loads in progress by cache key, shared by identical queries
+        self._inflight_loads: dict[str, asyncio.Task] = {}
+        # Tracks queued longer ago than this are looked up again before they play
+        self.revalidate_age = float(os.getenv("QUEUE_REVALIDATE_AGE", "3600"))
+
+        # Text searches and direct URLs are cached separately, URLs resolve
+        # to the same tracks for much longer than search rankings stay fresh.
+        self.search_cache = SearchCache(
+            max_size=int(os.getenv("SEARCH_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("SEARCH_CACHE_TTL", "900")),
+        )
+        self.url_cache = SearchCache(
+            max_size=int(os.getenv("URL_CACHE_SIZE", "128")),
+            ttl=float(os.getenv("URL_CACHE_TTL", "3600")),
+        )
+
+        sources = [
+            source.strip()
+            for source in os.getenv("SEARCH_SOURCES", "scsearch").split(",")
+            if source.strip()
+        ]
+        self.searcher = MultiSourceSearch(
+            sources,
+            self._get_tracks,
+            hedge_delay=float(os.getenv("SEARCH_HEDGE_DELAY", "0")),
+        )
 
     async def initialize(self) -> bool:
         """
         Initialize the lavalink client and wait for node connection.
         """
         try:
-            host = os.getenv("LAVALINK_HOST", "localhost")
-            port = int(os.getenv("LAVALINK_PORT", "2333"))
             password = os.getenv("LAVALINK_PASSWORD", "youshallnotpass")
+            region = os.getenv("LAVALINK_REGION", "us")
+            node_spec = os.getenv("LAVALINK_NODES")
+            if node_spec:
+                nodes = parse_nodes(node_spec, region)
+            else:
+                nodes = [
+                    NodeConfig(
+                        host=os.getenv("LAVALINK_HOST", "localhost"),
+                        port=int(os.getenv("LAVALINK_PORT", "2333")),
+                        region=region,
+                        name="default",
+                    )
+                ]
 
             bot_user = self.bot.get_me()
             if not bot_user:
                 logger.error("Bot user not available yet")
                 return False
 
-            logger.info(f"Initializing lavalink client for {host}:{port}")
+            logger.info(f"Initializing lavalink client with {len(nodes)} node(s)")
 
-            self.lavalink = lavalink.Client(user_id=bot_user.id)
+            self.lavalink = lavalink.Client(user_id=bot_user.id, player=MusicPlayer)
             self.lavalink.add_event_hooks(self)
 
-            # Add the node
-            self.lavalink.add_node(
-                host=host, port=port, password=password, region="us", name="default"
-            )
-
-            # Wait for node to be available (with timeout)
-            max_attempts = 10
-            attempt = 0
-
-            while attempt < max_attempts:
-                if self.lavalink.node_manager.available_nodes:
-                    logger.info("Lavalink node connected successfully")
-                    break
-                logger.info(
-                    f"Waiting for lavalink node connection... (attempt {attempt + 1}/{max_attempts})"
+            self.node_pool = NodePool(self.lavalink)
+            self.node_pool.add_nodes(nodes, password)
+
+            # Wait for a node to be available, woken by node events
+            timeout = float(os.getenv("LAVALINK_CONNECT_TIMEOUT", "10"))
+            logger.info("Waiting for lavalink node connection...")
+            if not await self.readiness.wait(
+                "nodes",
+                lambda: bool(
+                    self.lavalink and self.lavalink.node_manager.available_nodes
+                ),
+                timeout,
+            ):
+                logger.error(
+                    f"Failed to connect to lavalink node after {timeout} seconds"
                 )
-                await asyncio.sleep(1)
-                attempt += 1
-
-            if not self.lavalink.node_manager.available_nodes:
-                logger.error("Failed to connect to lavalink node after 10 attempts")
                 return False
+            logger.info("Lavalink node connected successfully")
 
             self.is_initialized = True
             logger.info(
-                f"Lavalink client initialized successfully. Connected to {host}:{port}"
+                f"Lavalink client initialized successfully. Available nodes: {len(self.lavalink.node_manager.available_nodes)}/{len(nodes)}"
+            )
+
+            self.reaper = PlayerReaper(
+                self,
+                idle_timeout=float(os.getenv("PLAYER_IDLE_TIMEOUT", "300")),
+                paused_timeout=float(os.getenv("PLAYER_PAUSED_TIMEOUT", "3600")),
+                empty_timeout=float(os.getenv("PLAYER_EMPTY_TIMEOUT", "60")),
+                interval=float(os.getenv("PLAYER_REAP_INTERVAL", "30")),
             )
+            self.reaper.start()
+
+            db_path = os.getenv("QUEUE_DB_PATH")
+            if db_path:
+                await self._open_queue_store(db_path)
             return True
 
         except Exception as e:
             logger.error(f"Failed to initialize lavalink client: {e}")
             return False
 
+    async def _open_queue_store(self, path: str) -> None:
+        """
+        Open the queue database, restore saved queues and start saving.
+        """
+        try:
+            self.queue_store = QueueStore(
+                path, save_interval=float(os.getenv("QUEUE_SAVE_INTERVAL", "5"))
+            )
+            snapshots = await asyncio.to_thread(self.queue_store.load)
+        except Exception as e:
+            logger.error(f"Failed to open queue database at {path}: {e}")
+            self.queue_store = None
+            return
+
+        for snapshot in snapshots:
+            await self._restore_guild(snapshot)
+        logger.info(f"Restored {len(snapshots)} music queue(s) from {path}")
+        self.queue_store.start(
+            self._store_markers, self._build_snapshot, self._store_positions
+        )
+
+    async def _restore_guild(self, snapshot: GuildSnapshot) -> None:
+        """
+        Put a saved queue back and, if the bot was in a voice channel,
+        rejoin it and carry on from the interrupted track.
+        """
+        guild_id = snapshot.guild_id
+        self.queues[guild_id] = restore_queue(snapshot)
+        if not snapshot.channel_id:
+            return
+        if not await self.connect_to_voice(guild_id, snapshot.channel_id):
+            return
+        player = self.lavalink.player_manager.get(guild_id) if self.lavalink else None
+        if player and await self.wait_until_connected(guild_id, player):
+            # Skip the interrupted track too if it has gone away since
+            await self._prefetch_next(guild_id)
+            await self.actors.run(guild_id, lambda: self._play_next(guild_id))
+
+    def _store_markers(self) -> dict[int, tuple]:
+        """
+        A marker per guild with music state, changing whenever the queue or
+        the current track does. The playback position is saved on its own,
+        see _store_positions.
+        """
+        markers = {}
+        for guild_id in self.queues.keys() | self.now_playing.keys():
+            queue = self.queues.get(guild_id)
+            current = self.now_playing.get(guild_id)
+            if not queue and not current:
+                continue
+            markers[guild_id] = (
+                queue.version if queue is not None else 0,
+                current.track.identifier if current else None,
+                current.added_at if current else None,
+            )
+        return markers
+
+    def _store_positions(self) -> dict[int, int]:
+        """
+        The playback position of every guild that is playing, so a restart
+        resumes close to where the track was.
+        """
+        positions = {}
+        for guild_id in self.now_playing:
+            player = (
+                self.lavalink.player_manager.get(guild_id) if self.lavalink else None
+            )
+            if player and player.current:
+                positions[guild_id] = player.position
+        return positions
+
+    def _build_snapshot(self, guild_id: int) -> GuildSnapshot:
+        """
+        Capture the music state of a guild for saving.
+        """
+        player = self.lavalink.player_manager.get(guild_id) if self.lavalink else None
+        queue = self.queues.get(guild_id)
+        return GuildSnapshot(
+            guild_id=guild_id,
+            channel_id=player.channel_id if player else None,
+            position=player.position if player and player.current else 0,
+            now_playing=self.now_playing.get(guild_id),
+            tracks=list(queue) if queue else [],
+        )
+
+    async def close(self) -> None:
+        """
+        Flush the saved queues. Called when the bot shuts down.
+        """
+        if self.reaper:
+            self.reaper.stop()
+        if self.queue_store:
+            await self.queue_store.close(
+                self._store_markers(), self._build_snapshot, self._store_positions()
+            )
+            self.queue_store = None
+
+    @lavalink.listener(lavalink.NodeConnectedEvent, lavalink.NodeReadyEvent)
+    async def on_node_ready(self, event) -> None:
+        """
+        Handle node connected/ready events, waking anything waiting on a node.
+        """
+        logger.info(f"Lavalink node '{event.node.name}' is available")
+        self.readiness.notify("nodes")
+
+    @lavalink.listener(lavalink.NodeDisconnectedEvent)
+    async def on_node_disconnected(self, event: lavalink.NodeDisconnectedEvent) -> None:
+        """
+        Handle node disconnected events.
+        Lavalink.py moves players itself when it can, anything it left behind
+        on the dead node is moved to the least loaded healthy node.
+        """
+        logger.warning(
+            f"Lavalink node '{event.node.name}' disconnected: code={event.code}, reason={event.reason}"
+        )
+        if self.node_pool:
+            moved = await self.node_pool.migrate_from(event.node)
+            if moved:
+                logger.info(f"Migrated {moved} player(s) off node '{event.node.name}'")
+
+    def notify_voice_update(self, guild_id: int) -> None:
+        """
+        Called after a voice state or server update for the bot has been passed
+        to lavalink, so waiters on that guild's connection can re-check.
+        """
+        self.readiness.notify(guild_id)
+
+    async def wait_until_connected(self, guild_id: int, player) -> bool:
+        """
+        Wait until the player for a guild is connected to voice.
+        """
+        timeout = float(os.getenv("VOICE_CONNECT_TIMEOUT", "5"))
+        return await self.readiness.wait(guild_id, lambda: player.is_connected, timeout)
+
     @lavalink.listener(lavalink.TrackLoadFailedEvent)
-    async def _on_track_load_failed(self, event: lavalink.TrackLoadFailedEvent) -> None:
+    async def on_track_load_failed(self, event: lavalink.TrackLoadFailedEvent) -> None:
         """
         Handle track load failed events.
         """
@@ -100,7 +307,7 @@ class MusicClient:
         )
 
     @lavalink.listener(lavalink.WebSocketClosedEvent)
-    async def _on_websocket_closed(self, event: lavalink.WebSocketClosedEvent) -> None:
+    async def on_websocket_closed(self, event: lavalink.WebSocketClosedEvent) -> None:
         """
         Handle websocket closed events.
         """
@@ -112,44 +319,63 @@ class MusicClient:
         )
 
     @lavalink.listener(lavalink.TrackStartEvent)
-    async def _on_track_start(self, event: lavalink.TrackStartEvent) -> None:
+    async def on_track_start(self, event: lavalink.TrackStartEvent) -> None:
         """
-        Handle track start events only
+        Handle track start events only.
+        Starts validating the next queued track while this one plays.
         """
         guild_id = int(event.player.guild_id)
         logger.info(f"Track started in guild {guild_id}: {event.track.title}")
+        self._schedule_prefetch(guild_id)
 
     @lavalink.listener(lavalink.TrackEndEvent)
-    async def _on_track_end(self, event: lavalink.TrackEndEvent) -> None:
+    async def on_track_end(self, event: lavalink.TrackEndEvent) -> None:
         """
         Handle track end events only
         """
         guild_id = int(event.player.guild_id)
         logger.info(f"Track ended in guild {guild_id}")
+        # A replaced track ends because we already started the next one
+        if event.reason == lavalink.EndReason.REPLACED:
+            return
         # Play next track if available
-        await self._play_next(guild_id)
+        await self.actors.run(guild_id, lambda: self._advance(guild_id))
+
+    async def _advance(self, guild_id: int) -> None:
+        """
+        Move on to the next queued track, or clear the current one if the
+        queue is empty.
+        """
+        if not await self._play_next(guild_id):
+            self.now_playing.pop(guild_id, None)
 
     @lavalink.listener(lavalink.TrackExceptionEvent)
-    async def _on_track_exception(self, event: lavalink.TrackExceptionEvent) -> None:
+    async def on_track_exception(self, event: lavalink.TrackExceptionEvent) -> None:
         """
-        Handle track exception events only
+        Handle track exception events only.
+        Lavalink follows every exception with a TrackEndEvent, which is what
+        moves the queue along.
         """
         guild_id = int(event.player.guild_id)
-        logger.error(f"Track exception in guild {guild_id}")
-        await self._play_next(guild_id)
+        logger.error(
+            f"Track exception in guild {guild_id}: {getattr(event, 'message', 'Unknown error')}"
+        )
 
     @lavalink.listener(lavalink.TrackStuckEvent)
-    async def _on_track_stuck(self, event: lavalink.TrackStuckEvent) -> None:
+    async def on_track_stuck(self, event: lavalink.TrackStuckEvent) -> None:
         """
         Handle track stuck events only
         """
         guild_id = int(event.player.guild_id)
         logger.warning(f"Track stuck in guild {guild_id}, skipping...")
-        await self._play_next(guild_id)
+        await self.actors.run(guild_id, lambda: self._play_next(guild_id))
 
     async def _play_next(self, guild_id: int) -> bool:
         """
         Play the next track in the queue.
+        A head that was restored or queued long ago has normally been looked
+        up again by the prefetch stage already, so it is handed to lavalink
+        straight away.
         """
         if not self.is_initialized or not self.lavalink:
             return False
@@ -158,58 +384,189 @@ class MusicClient:
         if not player:
             return False
 
-        if guild_id not in self.queues or not self.queues[guild_id]:
-            return False
+        queue = self.queues.get(guild_id)
+        while queue:
+            next_track = queue.popleft()
+            try:
+                if 0 < next_track.start_position < next_track.track.duration:
+                    await player.play(
+                        next_track.track, start_time=next_track.start_position
+                    )
+                else:
+                    await player.play(next_track.track)
+                self.now_playing[guild_id] = next_track
+                return True
+            except Exception as e:
+                logger.error(f"Failed to play next track: {e}")
+        return False
+
+    def _schedule_prefetch(self, guild_id: int) -> None:
+        """
+        Start (or restart) validating the head of a guild's queue in the background.
+        """
+        self._cancel_prefetch(guild_id)
+        if self.queues.get(guild_id):
+            self._prefetch_tasks[guild_id] = asyncio.create_task(
+                self._prefetch_next(guild_id)
+            )
+
+    def _cancel_prefetch(self, guild_id: int) -> None:
+        """
+        Cancel any running prefetch for a guild.
+        """
+        task = self._prefetch_tasks.pop(guild_id, None)
+        if task and not task.done():
+            task.cancel()
 
-        next_track = self.queues[guild_id].pop(0)
+    async def _prefetch_next(self, guild_id: int) -> None:
+        """
+        Make sure the head of the queue is playable, dropping dead tracks
+        until a good one is found or the queue runs out.
+        Tracks loaded from lavalink in the last revalidate_age seconds are
+        trusted as they are. Tracks restored from the queue database or
+        queued longer ago are looked up again, as the video or upload
+        behind them may be gone. A track is only dropped when lavalink finds
+        nothing for it, a failed lookup is retried and the track is kept if
+        it keeps failing.
+        """
+        queue = self.queues.get(guild_id)
+        failures = 0
         try:
-            await player.play(next_track.track)
-            return True
+            while queue:
+                head = queue.peek()
+                if head is None or head.validated:
+                    return
+                age = time.time() - head.added_at
+                if not head.restored and age < self.revalidate_age:
+                    return
+                try:
+                    track = await self._resolve_track(head.track)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    failures += 1
+                    if failures >= PREFETCH_ATTEMPTS:
+                        logger.warning(
+                            f"Could not validate next track in guild {guild_id}, keeping it: {e}"
+                        )
+                        return
+                    await asyncio.sleep(PREFETCH_RETRY_DELAY * failures)
+                    continue
+                # The head may have been played or removed while we waited
+                if queue.peek() is not head:
+                    failures = 0
+                    continue
+                if track is not None:
+                    queue.replace_track(head, track)
+                    head.validated = True
+                    return
+                queue.popleft()
+                logger.warning(
+                    f"Dropped unplayable track from queue in guild {guild_id}: {head.track.title}"
+                )
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to play next track: {e}")
-            return await self._play_next(guild_id)
+            logger.error(f"Failed to prefetch next track in guild {guild_id}: {e}")
+        finally:
+            if self._prefetch_tasks.get(guild_id) is asyncio.current_task():
+                del self._prefetch_tasks[guild_id]
+
+    async def _resolve_track(self, track: lavalink.AudioTrack):
+        """
+        Look a queued track up again, through the URL cache and the node pool.
+        Returns a fresh track, or None if lavalink found nothing for it.
+        Raises if the lookup itself failed, which says nothing about the track.
+        """
+        identifier = track.uri or track.identifier
+        if not identifier:
+            return None
 
+        results = self.url_cache.get(identifier)
+        if results is None:
+            results = await self._get_tracks(identifier)
+            if results is None:
+                raise RuntimeError("lavalink is not initialized")
+            if results.load_type == lavalink.LoadType.ERROR:
+                message = results.error.message if results.error else "unknown"
+                raise RuntimeError(f"Failed to load {identifier}: {message}")
+            if results.tracks:
+                self.url_cache.put(identifier, results)
+        return results.tracks[0] if results.tracks else None
+
+    @serialized(coalesce=True)
     async def connect_to_voice(self, guild_id: int, channel_id: int) -> bool:
         """
         Connect the bot to a voice channel.
+        Does nothing if the guild's player is already in that channel.
         """
         if not self.is_initialized or not self.lavalink:
             return False
+        player = self.lavalink.player_manager.get(guild_id)
+        if player and player.channel_id == channel_id:
+            self.queues.setdefault(guild_id, TrackQueue())
+            return True
         try:
-            await self.bot.update_voice_state(guild_id, channel_id)
+            # Create player without endpoint - let voice events handle the connection details.
+            # It has to exist before the voice events arrive, those are only
+            # forwarded to lavalink for guilds with a player.
+            node = self.node_pool.select() if self.node_pool else None
+            player = self.lavalink.player_manager.create(guild_id, node=node)
 
-            # Create player without endpoint - let voice events handle the connection details
-            player = self.lavalink.player_manager.create(guild_id)
+            await self.bot.update_voice_state(guild_id, channel_id)
 
             # Set default volume to 100%
             await player.set_volume(100)
 
             # Initialize queue if not exists
             if guild_id not in self.queues:
-                self.queues[guild_id] = []
+                self.queues[guild_id] = TrackQueue()
             return True
         except Exception as e:
             logger.error(f"Failed to connect to voice channel: {e}")
             return False
 
-    async def search_tracks(self, query: str):
+    async def load(self, query: str) -> lavalink.LoadResult | None:
         """
-        Search for tracks.
+        Resolve a query with lavalink, going through the search caches.
+        Returns the whole load result so callers can tell playlists apart.
         """
         if not self.is_initialized or not self.lavalink:
             return None
+        query, cache = self._normalize_query(query)
+        cached = cache.get(query)
+        if cached is not None:
+            logger.info(f"Search cache hit for query: {query}")
+            return cached
+
+        # Identical queries arriving together share one lavalink request
+        task = self._inflight_loads.get(query)
+        if task is None:
+            task = asyncio.create_task(self._load_uncached(query, cache))
+            self._inflight_loads[query] = task
+            task.add_done_callback(lambda _: self._inflight_loads.pop(query, None))
+        return await asyncio.shield(task)
+
+    async def _load_uncached(
+        self, query: str, cache: SearchCache
+    ) -> lavalink.LoadResult | None:
+        """
+        Load a normalized query from lavalink and cache the result.
+        """
         try:
-            if not (query.startswith("http://") or query.startswith("https://")):
-                query = f"scsearch:{query}"
             logger.info(f"Searching for tracks with query: {query}")
-            results = await self.lavalink.get_tracks(query)
+            if query.startswith(SEARCH_KEY_PREFIX):
+                results = await self.searcher.search(query[len(SEARCH_KEY_PREFIX) :])
+            else:
+                results = await self._get_tracks(query)
             if results and results.tracks:
                 logger.info(
                     f"Found {len(results.tracks)} tracks. First track: {results.tracks[0].title} by {results.tracks[0].author}"
                 )
                 logger.info(f"Track URI: {results.tracks[0].uri}")
                 logger.info(f"Track duration: {results.tracks[0].duration}ms")
-                return results.tracks
+                cache.put(query, results)
+                return results
             else:
                 logger.warning(f"No tracks found for query: {query}")
                 return None
@@ -217,6 +574,52 @@ class MusicClient:
             logger.error(f"Failed to search tracks: {e}")
             return None
 
+    async def search_tracks(self, query: str):
+        """
+        Search for tracks.
+        """
+        results = await self.load(query)
+        return results.tracks if results else None
+
+    async def _get_tracks(self, identifier: str) -> lavalink.LoadResult | None:
+        """
+        Load a single lavalink identifier on the least loaded node.
+        """
+        if not self.lavalink:
+            return None
+        node = self.node_pool.select() if self.node_pool else None
+        return await self.lavalink.get_tracks(identifier, node=node)
+
+    def _normalize_query(self, query: str) -> tuple[str, SearchCache]:
+        """
+        Turn a user query into a cache key and pick the cache for it.
+        URLs and queries with an explicit source prefix are kept as
+        identifiers, plain search terms are case and whitespace folded and
+        searched on every configured source.
+        """
+        query = query.strip()
+        if query.startswith(("http://", "https://")):
+            return query, self.url_cache
+        match = SOURCE_PREFIX_RE.match(query)
+        if match:
+            terms = " ".join(query[match.end() :].split()).casefold()
+            return f"{match.group(1).lower()}:{terms}", self.search_cache
+        return (
+            f"{SEARCH_KEY_PREFIX}{' '.join(query.split()).casefold()}",
+            self.search_cache,
+        )
+
+    def cache_stats(self) -> dict[str, dict]:
+        """
+        Get hit/miss counters for the search caches and per-source latency.
+        """
+        return {
+            "search": self.search_cache.stats(),
+            "url": self.url_cache.stats(),
+            "sources": self.searcher.stats_summary(),
+        }
+
+    @serialized()
     async def play_track(
         self, guild_id: int, track, requester_id: int, requester_name: str
     ) -> bool:
@@ -238,19 +641,13 @@ class MusicClient:
         )
 
         if guild_id not in self.queues:
-            self.queues[guild_id] = []
+            self.queues[guild_id] = TrackQueue()
 
-        if not player.is_playing:
+        # now_playing is set as soon as play is sent, before lavalink reports
+        # the track as started
+        if not player.is_playing and guild_id not in self.now_playing:
             try:
-                max_attempts = 10
-                attempt = 0
-                while not player.is_connected and attempt < max_attempts:
-                    logger.info(
-                        f"Waiting for player to connect... (attempt {attempt + 1}/{max_attempts})"
-                    )
-                    await asyncio.sleep(0.5)
-                    attempt += 1
-                if not player.is_connected:
+                if not await self.wait_until_connected(guild_id, player):
                     logger.error(
                         "Player is not connected to voice channel after waiting."
                     )
@@ -262,15 +659,97 @@ class MusicClient:
                 )
                 logger.info(f"Track info: {track.title} - {track.uri}")
                 await player.play(track)
+                self.now_playing[guild_id] = queue_track
                 logger.info("Track play command sent successfully")
                 return True
             except Exception as e:
                 logger.error(f"Failed to play track: {e}")
                 return False
         else:
-            self.queues[guild_id].append(queue_track)
+            queue = self.queues[guild_id]
+            queue.append(queue_track)
+            # The prefetch for this track's predecessor already finished
+            if len(queue) == 1:
+                self._schedule_prefetch(guild_id)
+            return True
+
+    @serialized()
+    async def play_playlist(
+        self, guild_id: int, tracks: list, requester_id: int, requester_name: str
+    ) -> bool:
+        """
+        Start the first track of a playlist right away, then queue the rest
+        in the background so a long playlist doesn't hold up the command.
+        If an earlier playlist is still being queued, the whole playlist is
+        queued after it instead.
+        """
+        if not tracks:
+            return False
+        previous = self._enqueue_tasks.get(guild_id)
+        if previous is not None and not previous.done():
+            self._enqueue_tasks[guild_id] = asyncio.create_task(
+                self._enqueue_in_chunks(
+                    guild_id, tracks, requester_id, requester_name, after=previous
+                )
+            )
             return True
+        if not await self.play_track(guild_id, tracks[0], requester_id, requester_name):
+            return False
+        if len(tracks) > 1:
+            self._enqueue_tasks[guild_id] = asyncio.create_task(
+                self._enqueue_in_chunks(
+                    guild_id, tracks[1:], requester_id, requester_name
+                )
+            )
+        return True
+
+    async def _enqueue_in_chunks(
+        self,
+        guild_id: int,
+        tracks: list,
+        requester_id: int,
+        requester_name: str,
+        after: asyncio.Task | None = None,
+    ) -> None:
+        """
+        Append tracks to a guild's queue a chunk at a time, letting other
+        events run between chunks. With after, waits for that earlier
+        playlist to be queued first; cancelling this cancels it too.
+        """
+        chunk_size = int(os.getenv("PLAYLIST_CHUNK_SIZE", "50"))
+        try:
+            if after is not None:
+                await after
+            queue = self.queues.setdefault(guild_id, TrackQueue())
+            added_at = time.time()
+            for start in range(0, len(tracks), chunk_size):
+                was_empty = not queue
+                for track in tracks[start : start + chunk_size]:
+                    queue.append(
+                        QueueTrack(
+                            track=track,
+                            requester_id=requester_id,
+                            requester_name=requester_name,
+                            added_at=added_at,
+                        )
+                    )
+                if was_empty:
+                    self._schedule_prefetch(guild_id)
+                await asyncio.sleep(0)
+            logger.info(f"Queued {len(tracks)} playlist tracks in guild {guild_id}")
+        finally:
+            if self._enqueue_tasks.get(guild_id) is asyncio.current_task():
+                del self._enqueue_tasks[guild_id]
 
+    def _cancel_enqueue(self, guild_id: int) -> None:
+        """
+        Cancel a playlist that is still being queued for a guild.
+        """
+        task = self._enqueue_tasks.pop(guild_id, None)
+        if task and not task.done():
+            task.cancel()
+
+    @serialized(coalesce=True)
     async def pause(self, guild_id: int) -> bool:
         """
         Pause playback.
@@ -287,6 +766,7 @@ class MusicClient:
             logger.error(f"Failed to pause: {e}")
             return False
 
+    @serialized(coalesce=True)
     async def resume(self, guild_id: int) -> bool:
         """
         Resume playback.
@@ -303,6 +783,7 @@ class MusicClient:
             logger.error(f"Failed to resume: {e}")
             return False
 
+    @serialized(coalesce=True)
     async def stop(self, guild_id: int) -> bool:
         """
         Stop playback and clear queue.
@@ -313,14 +794,18 @@ class MusicClient:
         if not player:
             return False
         try:
-            await player.stop()
+            self._cancel_prefetch(guild_id)
+            self._cancel_enqueue(guild_id)
             if guild_id in self.queues:
                 self.queues[guild_id].clear()
+            self.now_playing.pop(guild_id, None)
+            await player.stop()
             return True
         except Exception as e:
             logger.error(f"Failed to stop: {e}")
             return False
 
+    @serialized(coalesce=True)
     async def skip(self, guild_id: int) -> bool:
         """
         Skip the current track.
@@ -337,6 +822,7 @@ class MusicClient:
             logger.error(f"Failed to skip: {e}")
             return False
 
+    @serialized(coalesce=True)
     async def set_volume(self, guild_id: int, volume: int) -> bool:
         """
         Set the playback volume (0-100).
@@ -353,6 +839,7 @@ class MusicClient:
             logger.error(f"Failed to set volume: {e}")
             return False
 
+    @serialized(coalesce=True)
     async def disconnect_from_voice(self, guild_id: int) -> bool:
         """
         Disconnect from voice channel and clean up.
@@ -360,6 +847,8 @@ class MusicClient:
         if not self.is_initialized or not self.lavalink:
             return False
         try:
+            self._cancel_prefetch(guild_id)
+            self._cancel_enqueue(guild_id)
             await self.bot.update_voice_state(guild_id, None)
             player = self.lavalink.player_manager.get(guild_id)
             if player:
@@ -367,6 +856,7 @@ class MusicClient:
                 await self.lavalink.player_manager.destroy(guild_id)
             if guild_id in self.queues:
                 self.queues[guild_id].clear()
+            self.now_playing.pop(guild_id, None)
             return True
         except Exception as e:
             logger.error(f"Failed to disconnect: {e}")
@@ -399,11 +889,11 @@ class MusicClient:
         player = self.lavalink.player_manager.get(guild_id)
         return player.current if player else None
 
-    async def get_queue(self, guild_id: int) -> list:
+    async def get_queue(self, guild_id: int) -> TrackQueue:
         """
         Get the queue for a guild.
         """
-        return self.queues.get(guild_id, [])
+        return self.queues.get(guild_id) or TrackQueue()
 
 
 # Global instance
@@ -0,0 +1,197 @@
+"""
+This module decides when queued LLM requests are allowed to run, so that
+bursts stay inside the provider's rate limits instead of failing.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from collections.abc import Hashable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+MENTION_PRIORITY = 0
+EXPLANATION_PRIORITY = 1
+SUMMARY_PRIORITY = 2
+
+# Number of recent waits kept for the percentiles in stats()
+WAIT_SAMPLES = 500
+
+
+@dataclass
+class _Waiter:
+    user: Hashable
+    future: asyncio.Future
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class LLMScheduler:
+    """
+    Hands out slots to run LLM requests in.
+
+    At most max_concurrent requests run at once, and new ones start at no
+    more than rate per second, with up to burst allowed to start back to
+    back after a quiet spell. Waiting requests are served by priority, and
+    within a priority round-robin between users, so one person spamming
+    mentions can't starve everyone else. Users are keyed by Discord ID.
+
+    Optional extra requests, like hedges, take a slot with try_acquire()
+    only when one is free right away, so they count against both limits
+    without ever queueing ahead of anyone.
+    """
+
+    def __init__(self, max_concurrent: int, rate: float, burst: int):
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst
+        self.active: int = 0
+        self.granted: int = 0
+        self.extra: int = 0
+        self.peak_depth: int = 0
+        self._tokens: float = float(burst)
+        self._refilled: float = time.monotonic()
+        self._queues: dict[int, OrderedDict[Hashable, deque[_Waiter]]] = {}
+        self._waits: deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._wakeup: asyncio.TimerHandle | None = None
+
+    @property
+    def depth(self) -> int:
+        return sum(
+            len(waiters)
+            for queue in self._queues.values()
+            for waiters in queue.values()
+        )
+
+    @asynccontextmanager
+    async def slot(self, priority: int, user: Hashable):
+        """
+        Wait for a turn to make an LLM request, holding it until the block
+        exits.
+        """
+        waiter = _Waiter(user, asyncio.get_running_loop().create_future())
+        queue = self._queues.setdefault(priority, OrderedDict())
+        queue.setdefault(user, deque()).append(waiter)
+        self.peak_depth = max(self.peak_depth, self.depth)
+        self._dispatch()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled, give the slot back
+                self.release()
+            else:
+                self._remove(priority, waiter)
+            raise
+
+        try:
+            yield
+        finally:
+            self.release()
+
+    def try_acquire(self) -> bool:
+        """
+        Take a slot now if one is free and nobody is waiting for it.
+        Returns False otherwise. A slot taken here must be given back with
+        release().
+        """
+        if self.depth or self.active >= self.max_concurrent:
+            return False
+        if self.rate > 0:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+        self.active += 1
+        self.extra += 1
+        return True
+
+    def release(self) -> None:
+        """
+        Give a slot back and start whatever can run next.
+        """
+        self.active -= 1
+        self._dispatch()
+
+    def _remove(self, priority: int, waiter: _Waiter) -> None:
+        queue = self._queues.get(priority, {})
+        waiters = queue.get(waiter.user)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del queue[waiter.user]
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._refilled) * self.rate
+        )
+        self._refilled = now
+
+    def _next_waiter(self) -> _Waiter | None:
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            while queue:
+                user, waiters = next(iter(queue.items()))
+                waiter = waiters.popleft()
+                # Send the user to the back of the line for their next one
+                if waiters:
+                    queue.move_to_end(user)
+                else:
+                    del queue[user]
+                if not waiter.future.done():
+                    return waiter
+        return None
+
+    def _dispatch(self) -> None:
+        """
+        Start as many waiting requests as the limits allow.
+        """
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        while self.active < self.max_concurrent and self.depth:
+            if self.rate > 0:
+                self._refill()
+                if self._tokens < 1:
+                    delay = (1 - self._tokens) / self.rate
+                    self._wakeup = asyncio.get_running_loop().call_later(
+                        delay, self._dispatch
+                    )
+                    return
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            if self.rate > 0:
+                self._tokens -= 1
+            self.active += 1
+            self.granted += 1
+            wait = time.monotonic() - waiter.queued_at
+            self._waits.append(wait)
+            if wait > 1:
+                logger.debug(f"LLM request waited {wait:.2f}s for a slot")
+            waiter.future.set_result(None)
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Requests running and queued, and how long recent ones waited.
+        """
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+
+        return {
+            "active": self.active,
+            "queued": self.depth,
+            "peak_queued": self.peak_depth,
+            "granted": self.granted,
+            "extra": self.extra,
+            "wait_p50": round(percentile(0.5), 3),
+            "wait_p95": round(percentile(0.95), 3),
+            "wait_max": round(waits[-1], 3) if waits else 0.0,
+        }
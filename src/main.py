@@ -4,8 +4,11 @@ is in being able to roll dice for players of a tabletop roleplaying game
 but she is also capable of doing some basic audio things.
 """
 
+import time
+
+_import_started = time.perf_counter()
+
 import os
-import re
 from pathlib import Path
 
 import hikari
@@ -19,10 +22,20 @@ if env_path.exists():
     load_dotenv(env_path)
 
 from src._logger import logger
-from src.audio import music
-from src.chat import chat
+from src.botprofile import build_profile, resident_cache_sizes
+from src.constants import REPLY_ERROR
+from src.messagefilter import MentionFilter, sanitize_author, sanitize_content
+from src.replystream import StreamedReply
+from src.startup import StartupTimer
+
+# Subsystem modules (audio, chat, ...) are imported in on_starting and
+# __main__, only once their required env vars have been checked
+startup = StartupTimer(created=_import_started)
+startup.record("imports", time.perf_counter() - _import_started)
 
 AUDIO_REQUIRED_VARS = ["LAVALINK_HOST", "LAVALINK_PORT", "LAVALINK_PASSWORD"]
+# LAVALINK_NODES replaces LAVALINK_HOST/LAVALINK_PORT when running several nodes
+AUDIO_NODES_REQUIRED_VARS = ["LAVALINK_NODES", "LAVALINK_PASSWORD"]
 # Chat also requires an API key, but the var name will be different
 # depending on whatever service being used, so can't check for.
 CHAT_REQUIRED_VARS = ["LLM_MODEL"]
@@ -35,14 +48,6 @@ SCHEDULING_REQUIRED_VARS = [
     "NOTION_VERSION",
 ]
 
-bot = hikari.GatewayBot(
-    intents=hikari.Intents.ALL,
-    suppress_optimization_warning=True,
-    banner=None,
-    token=os.environ["DISCORD_API_KEY"],
-)
-client = lightbulb.client_from_app(bot)
-
 
 def check_for_required_env_vars(vars: list[str]) -> bool:
     """
@@ -58,6 +63,44 @@ def check_for_required_env_vars(vars: list[str]) -> bool:
     return True
 
 
+def get_enabled_modules() -> set[str]:
+    """
+    Returns the names of the modules whose required env vars are all present.
+    """
+    required_vars = {
+        "audio": AUDIO_NODES_REQUIRED_VARS
+        if os.environ.get("LAVALINK_NODES")
+        else AUDIO_REQUIRED_VARS,
+        "chat": CHAT_REQUIRED_VARS,
+        "images": IMAGES_REQUIRED_VARS,
+        "rolling": ROLLING_REQUIRED_VARS,
+        "scheduling": SCHEDULING_REQUIRED_VARS,
+    }
+    return {
+        module
+        for module, vars in required_vars.items()
+        if check_for_required_env_vars(vars)
+    }
+
+
+ENABLED_MODULES = get_enabled_modules()
+# Only subscribe to and cache what the enabled modules actually use
+intents, cache_settings = build_profile(ENABLED_MODULES)
+
+bot = hikari.GatewayBot(
+    intents=intents,
+    cache_settings=cache_settings,
+    suppress_optimization_warning=True,
+    banner=None,
+    token=os.environ["DISCORD_API_KEY"],
+)
+client = lightbulb.client_from_app(bot)
+
+# Seconds between edits of a reply that is still being generated, 0 sends
+# replies only once they are complete
+STREAM_EDIT_INTERVAL = float(os.getenv("CHAT_STREAM_INTERVAL", "1.0"))
+
+
 async def handle_mention(message: hikari.Message):
     """
     handle_mention is a coroutine that handles the bot's response to being mentioned
@@ -71,52 +114,59 @@ async def handle_mention(message: hikari.Message):
     if chat_inst is None:
         return
 
-    message_content = message_content.replace("@Dolores", "Dolores")
-    message_content = message_content.replace("@everyone", "everyone")
-    message_content = message_content.replace("@Testie", "Testie")
-
-    # Remove invalid characters from author name
-    author = message.author.display_name
-    if author:
-        author = re.sub(r"[^a-zA-Z0-9_]", "", author)
-        author = author.replace(" ", "_")
-    else:
-        author = "discord_user"  # Fallback to a default name
+    message_content = sanitize_content(message_content)
+    author = sanitize_author(message.author.display_name)
 
     logger.info(f"Generating reply to following message: {message_content}")
-    reply = await chat_inst.generate_reply(author, message_content)
+    if STREAM_EDIT_INTERVAL > 0:
+        chunks = chat_inst.stream_reply(
+            author, message_content, message.channel_id, message.author.id
+        )
+        await StreamedReply(message, STREAM_EDIT_INTERVAL).run(chunks)
+        return
+
+    reply = await chat_inst.generate_reply(
+        author, message_content, message.channel_id, message.author.id
+    )
 
     if reply != "":
         await message.respond(reply, reply=message)
 
 
-async def handle_question(message) -> None:
+async def handle_mentions(messages: list[hikari.Message]) -> None:
     """
-    When someone reacts with a question mark to a message, Dolores will attempt
-    to explain the contents of the message in an informative simpler way.
-    Calls generate_explanation in the generation module.
+    handle_mentions answers mentions that arrived in the same channel while
+    it was busy answering an earlier one. A lone mention gets the usual reply, several get
+    one LLM call whose answer is split back up into a reply to each.
     """
-    message_content = message.content
-    if message_content is None:
+    messages = [message for message in messages if message.content]
+    if len(messages) <= 1 or chat_inst is None:
+        for message in messages:
+            await handle_mention(message)
         return
 
-    if chat_inst is None:
+    batch = [
+        (
+            sanitize_author(message.author.display_name),
+            sanitize_content(message.content),
+        )
+        for message in messages
+    ]
+    logger.info(f"Generating replies to {len(batch)} messages: {batch}")
+    replies = await chat_inst.generate_batch_reply(batch, messages[0].channel_id)
+
+    if replies == REPLY_ERROR:
+        for message in messages:
+            await message.respond(replies, reply=message)
         return
-
-    # Remove invalid characters from author name
-    author = message.author.display_name
-    if author:
-        author = re.sub(r"[^a-zA-Z0-9_]", "", author)
-        author = author.replace(" ", "_")
-    else:
-        author = "discord_user"  # Fallback to a default name
-
-    logger.info(f"Generating explanation for message: {message_content}")
-
-    explanation = chat_inst.generate_explanation(author, message_content)
-
-    if explanation:
-        await message.respond(explanation, reply=message)
+    if isinstance(replies, str):
+        # Couldn't tell which part answers which message, so answer each alone
+        logger.info("Batch reply couldn't be split, replying to each message")
+        for message in messages:
+            await handle_mention(message)
+        return
+    for message, reply in zip(messages, replies):
+        await message.respond(reply, reply=message)
 
 
 # ---------------------------------------------------------------------------
@@ -125,6 +175,14 @@ async def handle_question(message) -> None:
 
 
 BOT_USER_ID = None
+AUDIO_LOADED = False
+# Forwards the bot's own voice events to lavalink, set up with the audio module
+voice_router = None
+mention_filter = MentionFilter()
+# Groups mentions that arrive together in a channel, set up with the chat module
+mention_batcher = None
+# Answers question mark reactions, set up with the chat module
+explainer = None
 
 
 @bot.listen()
@@ -138,9 +196,50 @@ async def on_ready(event: hikari.StartedEvent) -> None:
     me = bot.get_me()
     if me is not None:
         BOT_USER_ID = me.id
+        mention_filter.set_identity(me.id)
+        if voice_router:
+            voice_router.bot_user_id = me.id
     else:
         logger.warning("Could not determine bot user ID in on_ready.")
     logger.info("Dolores has connected to Discord.")
+    startup.finish("gateway")
+    if "gateway" in startup.phases and not startup.reported:
+        startup.reported = True
+        logger.info(f"Startup timings: {startup.summary()}")
+        logger.info(f"Resident cache sizes: {resident_cache_sizes(bot.cache)}")
+
+    # Restore saved music queues right away rather than on the first command
+    if AUDIO_LOADED and os.environ.get("QUEUE_DB_PATH"):
+        from src.lavaclient import get_music_client
+
+        await get_music_client(bot)
+
+
+@bot.listen()
+async def on_stopping(_: hikari.StoppingEvent) -> None:
+    """
+    on_stopping gets called when the bot is shutting down. Saves the music
+    queues one last time.
+    """
+    if mention_batcher:
+        await mention_batcher.close()
+        logger.info(f"Mention batches: {mention_batcher.stats()}")
+    if chat_inst:
+        logger.info(f"Chat history: {chat_inst.history.stats()}")
+        logger.info(f"LLM scheduler: {chat_inst.scheduler.stats()}")
+        logger.info(f"LLM models: {chat_inst.hedger.stats()}")
+        await chat_inst.explanations.close()
+    if explainer:
+        logger.info(f"Explanations: {explainer.stats()}")
+    if not AUDIO_LOADED:
+        return
+
+    from src.lavaclient import music_client
+
+    if voice_router:
+        logger.info(f"Voice events: {voice_router.stats()}")
+    if music_client:
+        await music_client.close()
 
 
 @bot.listen()
@@ -149,30 +248,33 @@ async def on_reaction_add(event: hikari.ReactionAddEvent):
     on_reaction_add is a base function for handling when a reaction is added
     to a message. Currently used to check for question mark reaction
     """
+    if explainer is None:
+        return
     if event.is_for_emoji("❓") or event.is_for_emoji("❔"):
-        await handle_question(event.message_id)
+        await explainer.answer(event.channel_id, event.message_id, event.user_id)
 
 
-@bot.listen()
-async def on_message(event: hikari.MessageCreateEvent):
+async def on_payload(event: hikari.ShardPayloadEvent) -> None:
     """
-    on_message is the base function for handling any message that is sent on the server.
-    There are a couple special cases that are handled here
+    on_payload sees every raw gateway event, keeps the explainer's message
+    cache up to date and picks out messages that mention the bot.
+    Subscribed only when the chat module is enabled. Nothing else listens
+    for new messages, so hikari never builds message objects for the rest.
     """
-
-    if not event.is_human:
+    if not event.name.startswith("MESSAGE_"):
         return
-
-    me = bot.get_me()
-
-    if (
-        me.id in event.message.user_mentions_ids  # type: ignore
-        and "@everyone" not in event.message.content  # type: ignore
-    ):
-        logger.info(f"Message: {event.message}")
-        await handle_mention(event.message)
+    if explainer:
+        explainer.observe(event.name, event.payload)
+    if event.name != "MESSAGE_CREATE" or not mention_filter.matches(event.payload):
         return
 
+    message = bot.entity_factory.deserialize_message(event.payload)
+    logger.info(f"Message: {message}")
+    if mention_batcher:
+        mention_batcher.submit(message)
+    else:
+        await handle_mention(message)
+
 
 @bot.listen(hikari.StartingEvent)
 async def on_starting(_: hikari.StartingEvent) -> None:
@@ -180,76 +282,56 @@ async def on_starting(_: hikari.StartingEvent) -> None:
     Called while bot is starting up. Adds commands to it. Any other initialization-related
     things that need to be done before the bot connects to discord should be done here.
     """
-    if check_for_required_env_vars(AUDIO_REQUIRED_VARS):
+    global AUDIO_LOADED, voice_router
+
+    if "audio" in ENABLED_MODULES:
+        AUDIO_LOADED = True
         logger.info("Loading audio module")
-        # await client.load_extensions("audio")
-        client.register(music)
-    if check_for_required_env_vars(IMAGES_REQUIRED_VARS):
+        with startup.phase("audio"):
+            from src.audio import music
+            from src.voicerouter import VoiceEventRouter
+
+            voice_router = VoiceEventRouter()
+            voice_router.subscribe(bot)
+
+            # await client.load_extensions("audio")
+            client.register(music)
+    if "chat" in ENABLED_MODULES:
+        bot.subscribe(hikari.ShardPayloadEvent, on_payload)
+    if "images" in ENABLED_MODULES:
         logger.info("Loading images module")
-        await client.load_extensions("images")
-    if check_for_required_env_vars(ROLLING_REQUIRED_VARS):
+        with startup.phase("images"):
+            await client.load_extensions("images")
+    if "rolling" in ENABLED_MODULES:
         logger.info("Loading rolling module")
-        await client.load_extensions("rolling")
-    if check_for_required_env_vars(SCHEDULING_REQUIRED_VARS):
+        with startup.phase("rolling"):
+            await client.load_extensions("rolling")
+    if "scheduling" in ENABLED_MODULES:
         logger.info("Loading scheduling module")
-        await client.load_extensions("scheduling")
-
-    await client.start()
-
-
-@bot.listen()
-async def on_voice_state_update(event: hikari.VoiceStateUpdateEvent):
-    """
-    Handle voice state updates for lavalink integration.
-    This is required for lavalink to know about voice connections.
-    """
-    from src.lavaclient import music_client
-
-    if music_client and music_client.lavalink:
-        if event.state and BOT_USER_ID:
-            lava_data = {
-                "t": "VOICE_STATE_UPDATE",
-                "d": {
-                    "guild_id": str(event.guild_id),
-                    "user_id": str(BOT_USER_ID),
-                    "session_id": event.state.session_id,
-                    "channel_id": str(event.state.channel_id)
-                    if event.state.channel_id
-                    else None,
-                },
-            }
-            logger.debug(f"Voice state update data: {lava_data}")
-            await music_client.lavalink.voice_update_handler(lava_data)
-
-
-@bot.listen()
-async def on_voice_server_update(event: hikari.VoiceServerUpdateEvent):
-    """
-    Handle voice server updates for lavalink integration.
-    This is required for lavalink to connect to Discord's voice servers.
-    """
-    from src.lavaclient import music_client
+        with startup.phase("scheduling"):
+            await client.load_extensions("scheduling")
 
-    if music_client and music_client.lavalink:
-        lava_data = {
-            "t": "VOICE_SERVER_UPDATE",
-            "d": {
-                "guild_id": str(event.guild_id),
-                "token": event.token,
-                # Remove "wss://" prefix
-                "endpoint": event.endpoint[6:],  # type: ignore
-            },
-        }
-        logger.debug(f"Voice server update data: {lava_data}")
-        await music_client.lavalink.voice_update_handler(lava_data)
+    with startup.phase("commands"):
+        await client.start()
+    startup.start("gateway")
 
 
 if __name__ == "__main__":
     """
     Main program entry point
     """
-    if check_for_required_env_vars(CHAT_REQUIRED_VARS):
-        chat_inst = chat()
+    if "chat" in ENABLED_MODULES:
+        with startup.phase("chat"):
+            from src.chat import chat
+            from src.explanations import ExplanationService
+
+            chat_inst = chat()
+            explainer = ExplanationService(bot, chat_inst)
+            max_batch = int(os.getenv("CHAT_BATCH_SIZE", "10"))
+            if max_batch > 1:
+                from src.mentionbatcher import MentionBatcher
+
+                mention_batcher = MentionBatcher(max_batch, handle_mentions)
     else:
         chat_inst = None
     bot.run()
@@ -0,0 +1,84 @@
+"""
+This module groups mentions that arrive close together in a channel so
+they can be answered with a single LLM call.
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+import hikari
+
+logger = logging.getLogger(__name__)
+
+
+class MentionBatcher:
+    """
+    Collects mentions per channel and passes them to handler in batches.
+
+    A mention in a quiet channel is handled on its own straight away.
+    Mentions that arrive while the channel is being answered are held, and
+    handled together (up to max_batch at a time) as soon as that call
+    finishes. A channel never has more than one LLM call going, so its
+    history is extended in order, and nobody waits on a timer.
+    """
+
+    def __init__(
+        self,
+        max_batch: int,
+        handler: Callable[[list[hikari.Message]], Awaitable[None]],
+    ):
+        self.max_batch = max_batch
+        self.handler = handler
+        self.mentions: int = 0
+        self.batches: int = 0
+        self.largest: int = 0
+        self._pending: dict[int, list[hikari.Message]] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+
+    def submit(self, message: hikari.Message) -> None:
+        """
+        Answer a mention now, or with the next batch if its channel is busy.
+        """
+        self.mentions += 1
+        channel_id = int(message.channel_id)
+        self._pending.setdefault(channel_id, []).append(message)
+        if channel_id not in self._workers:
+            self._workers[channel_id] = asyncio.create_task(self._drain(channel_id))
+
+    async def _drain(self, channel_id: int) -> None:
+        try:
+            while pending := self._pending.get(channel_id):
+                batch = pending[: self.max_batch]
+                del pending[: self.max_batch]
+                if not pending:
+                    del self._pending[channel_id]
+                self.batches += 1
+                self.largest = max(self.largest, len(batch))
+                try:
+                    await self.handler(batch)
+                except Exception as e:
+                    logger.error(
+                        f"Error answering {len(batch)} mentions in {channel_id}: {e}"
+                    )
+        finally:
+            self._workers.pop(channel_id, None)
+
+    async def close(self) -> None:
+        """
+        Stop answering. Mentions still waiting for a batch are dropped.
+        """
+        for task in list(self._workers.values()):
+            task.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._pending.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Mentions received, batches answered and the largest batch seen.
+        """
+        return {
+            "mentions": self.mentions,
+            "batches": self.batches,
+            "largest": self.largest,
+        }
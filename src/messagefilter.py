@@ -0,0 +1,60 @@
+"""
+This module contains the cheap checks run on every incoming message before
+the bot decides to do anything with it.
+"""
+
+import re
+from collections.abc import Mapping
+from typing import Any
+
+# Names that would ping someone if echoed back, replaced with plain text
+PING_NAMES_RE = re.compile(r"@(Dolores|everyone|Testie)")
+# Anything that can't go in an LLM message name
+AUTHOR_INVALID_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def sanitize_content(content: str) -> str:
+    """
+    Strip the @ from pings of the bot and everyone in a message.
+    """
+    return PING_NAMES_RE.sub(r"\1", content)
+
+
+def sanitize_author(name: str | None) -> str:
+    """
+    Reduce a display name to the characters allowed in an LLM message name.
+    """
+    if name:
+        name = AUTHOR_INVALID_RE.sub("", name)
+    return name or "discord_user"
+
+
+class MentionFilter:
+    """
+    Decides from the raw MESSAGE_CREATE payload whether a message mentions
+    the bot, so that every other message is dropped before hikari builds
+    any objects for it.
+    """
+
+    def __init__(self):
+        self.bot_id: str | None = None
+
+    def set_identity(self, bot_id: int) -> None:
+        """
+        Remember the bot's user ID, called once the bot is ready.
+        """
+        self.bot_id = str(bot_id)
+
+    def matches(self, payload: Mapping[str, Any]) -> bool:
+        """
+        True if the message was sent by a human and mentions the bot.
+        """
+        # Most messages mention nobody, so this is usually the only check
+        mentions = payload.get("mentions")
+        if not mentions or self.bot_id is None:
+            return False
+        if payload["author"].get("bot") or payload.get("webhook_id"):
+            return False
+        if "@everyone" in payload.get("content", ""):
+            return False
+        return any(user["id"] == self.bot_id for user in mentions)
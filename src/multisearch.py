@@ -0,0 +1,149 @@
+"""
+This module fans a search out over several lavalink sources at once and
+keeps the first usable answer.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+
+import lavalink
+
+logger = logging.getLogger(__name__)
+
+
+class SourceStats:
+    """
+    Running latency and outcome counters for one search source.
+    """
+
+    # Weight given to the newest sample in the moving average
+    ALPHA = 0.2
+
+    def __init__(self, source: str):
+        self.source = source
+        self.latency: float | None = None
+        self.wins: int = 0
+        self.empty: int = 0
+        self.failures: int = 0
+
+    def record(self, elapsed: float) -> None:
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += self.ALPHA * (elapsed - self.latency)
+
+    @property
+    def score(self) -> float:
+        """
+        Expected cost of trying this source: average latency, inflated by how
+        often it comes back empty or fails. Unmeasured sources score 0.
+        """
+        if self.latency is None:
+            return 0.0
+        attempts = self.wins + self.empty + self.failures
+        success_rate = (self.wins + 1) / (attempts + 1)
+        return self.latency / success_rate
+
+    def record_lower_bound(self, elapsed: float) -> None:
+        """
+        A cancelled request took at least elapsed, only ever raise the average.
+        """
+        if self.latency is None or elapsed > self.latency:
+            self.record(elapsed)
+
+
+class MultiSourceSearch:
+    """
+    Runs a search on several source prefixes (scsearch, ytsearch, ...) in
+    parallel, returns the first result that has tracks and cancels the rest.
+
+    Sources are started best first, going by latency and hit rate. With a
+    hedge delay each further source only starts if nothing has answered yet,
+    which saves requests when the fastest source is reliable.
+    """
+
+    def __init__(
+        self,
+        sources: list[str],
+        fetch: Callable[[str], Awaitable[lavalink.LoadResult | None]],
+        hedge_delay: float = 0.0,
+    ):
+        self.sources = sources
+        self.fetch = fetch
+        self.hedge_delay = hedge_delay
+        self.stats: dict[str, SourceStats] = {s: SourceStats(s) for s in sources}
+
+    def ordered_sources(self) -> list[str]:
+        """
+        Sources sorted by score, best first. Sources without samples go first
+        so they get measured.
+        """
+        return sorted(self.sources, key=lambda s: self.stats[s].score)
+
+    async def search(self, terms: str) -> lavalink.LoadResult | None:
+        """
+        Search every source for terms and return the first result with tracks.
+        """
+        pending: set[asyncio.Task] = set()
+        for index, source in enumerate(self.ordered_sources()):
+            task = asyncio.create_task(
+                self._search_source(source, terms, index * self.hedge_delay)
+            )
+            pending.add(task)
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    result = task.result()
+                    if result is not None:
+                        return result
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _search_source(
+        self, source: str, terms: str, delay: float
+    ) -> lavalink.LoadResult | None:
+        if delay:
+            await asyncio.sleep(delay)
+
+        stats = self.stats[source]
+        started = time.perf_counter()
+        try:
+            result = await self.fetch(f"{source}:{terms}")
+        except asyncio.CancelledError:
+            stats.record_lower_bound(time.perf_counter() - started)
+            raise
+        except Exception as e:
+            stats.failures += 1
+            logger.warning(f"Search on {source} failed: {e}")
+            return None
+
+        stats.record(time.perf_counter() - started)
+        if not result or not result.tracks:
+            stats.empty += 1
+            return None
+        stats.wins += 1
+        return result
+
+    def stats_summary(self) -> dict[str, dict]:
+        """
+        Per-source latency and outcome counters, for logging.
+        """
+        return {
+            source: {
+                "latency_ms": round(stats.latency * 1000, 1)
+                if stats.latency is not None
+                else None,
+                "wins": stats.wins,
+                "empty": stats.empty,
+                "failures": stats.failures,
+            }
+            for source, stats in self.stats.items()
+        }
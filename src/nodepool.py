@@ -0,0 +1,154 @@
+"""
+This module handles picking lavalink nodes when more than one is configured.
+"""
+
+import logging
+import math
+from dataclasses import dataclass
+
+import lavalink
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class NodeConfig:
+    """
+    Connection details for a single lavalink node.
+    """
+
+    host: str
+    port: int
+    region: str
+    name: str
+
+
+def parse_nodes(spec: str, default_region: str) -> list[NodeConfig]:
+    """
+    Parse a LAVALINK_NODES value into node configs.
+    Entries are comma separated, in the form host:port or host:port/region.
+    """
+    nodes = []
+    for index, entry in enumerate(spec.split(","), start=1):
+        entry = entry.strip()
+        if not entry:
+            continue
+        address, _, region = entry.partition("/")
+        host, _, port = address.rpartition(":")
+        if not host or not port.isdigit():
+            raise ValueError(f"Invalid lavalink node '{entry}', expected host:port")
+        nodes.append(
+            NodeConfig(
+                host=host,
+                port=int(port),
+                region=region or default_region,
+                name=f"node-{index}",
+            )
+        )
+    return nodes
+
+
+def node_score(node: lavalink.Node) -> float:
+    """
+    Load score for a node, lower is better.
+
+    Lavalink only sends stats about once a minute, so the player count comes
+    from our own player manager instead of the stats. That way a burst of new
+    players doesn't all land on whichever node looked idle a minute ago.
+    CPU load and frame deficit come from the latest stats.
+    """
+    if not node.available:
+        return math.inf
+    penalty = node.stats.penalty
+    return (
+        len(node.players)
+        + penalty.cpu_penalty
+        + penalty.deficit_frame_penalty
+        + penalty.null_frame_penalty
+    )
+
+
+class NodePool:
+    """
+    Selects nodes for new players and moves players off nodes that die.
+    """
+
+    def __init__(self, client: lavalink.Client):
+        self.client = client
+
+    @property
+    def nodes(self) -> list[lavalink.Node]:
+        return self.client.node_manager.nodes
+
+    def add_nodes(self, configs: list[NodeConfig], password: str) -> None:
+        """
+        Register every configured node with the lavalink client.
+        """
+        for config in configs:
+            logger.info(
+                f"Adding lavalink node '{config.name}' at {config.host}:{config.port} ({config.region})"
+            )
+            self.client.add_node(
+                host=config.host,
+                port=config.port,
+                password=password,
+                region=config.region,
+                name=config.name,
+            )
+
+    def select(
+        self, region: str | None = None, exclude: list[lavalink.Node] | None = None
+    ) -> lavalink.Node | None:
+        """
+        Pick the least loaded available node, preferring the given region.
+        """
+        candidates = [
+            node
+            for node in self.client.node_manager.available_nodes
+            if node not in (exclude or [])
+        ]
+        if region:
+            regional = [node for node in candidates if node.region == region]
+            candidates = regional or candidates
+        if not candidates:
+            return None
+        return min(candidates, key=node_score)
+
+    async def migrate_from(self, dead_node: lavalink.Node) -> int:
+        """
+        Move any players still assigned to an unavailable node onto the best
+        healthy node. Returns how many players were moved.
+        """
+        moved = 0
+        for player in dead_node.players:
+            target = self.select(dead_node.region, exclude=[dead_node])
+            if target is None:
+                logger.warning(
+                    f"No healthy lavalink node to move guild {player.guild_id} to"
+                )
+                break
+            try:
+                await player.change_node(target)
+                moved += 1
+                logger.info(
+                    f"Moved guild {player.guild_id} from node '{dead_node.name}' to '{target.name}'"
+                )
+            except Exception as e:
+                logger.error(f"Failed to move guild {player.guild_id}: {e}")
+        return moved
+
+    def stats(self) -> list[dict]:
+        """
+        Current load figures for every node, for logging.
+        """
+        return [
+            {
+                "name": node.name,
+                "available": node.available,
+                "players": len(node.players),
+                "system_load": node.stats.system_load,
+                "frames_deficit": node.stats.frames_deficit,
+                "score": node_score(node),
+            }
+            for node in self.nodes
+        ]
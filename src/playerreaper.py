@@ -0,0 +1,170 @@
+"""
+This module cleans up lavalink players that are no longer being used.
+"""
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING
+
+import lavalink
+
+if TYPE_CHECKING:
+    from src.lavaclient import MusicClient
+
+logger = logging.getLogger(__name__)
+
+
+class PlayerReaper:
+    """
+    Periodically disconnects players that have had nothing playing for
+    idle_timeout seconds, have been paused for paused_timeout seconds, or
+    whose voice channel has had no listeners for empty_timeout seconds.
+    A timeout of 0 turns that check off. Pausing is something people do on
+    purpose, so paused players get their own, much longer, timeout.
+
+    Listeners are counted from the hikari voice state cache, so a sweep
+    makes no API calls unless it finds something to reclaim.
+    """
+
+    def __init__(
+        self,
+        client: "MusicClient",
+        idle_timeout: float = 300.0,
+        paused_timeout: float = 3600.0,
+        empty_timeout: float = 60.0,
+        interval: float = 30.0,
+    ):
+        self.client = client
+        self.idle_timeout = idle_timeout
+        self.paused_timeout = paused_timeout
+        self.empty_timeout = empty_timeout
+        self.interval = interval
+        self.reclaimed: int = 0
+        # When each guild was first seen idle, paused or without listeners
+        self._idle_since: dict[int, float] = {}
+        self._paused_since: dict[int, float] = {}
+        self._empty_since: dict[int, float] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """
+        Start the background sweep loop.
+        """
+        if self._task is None and (
+            self.idle_timeout or self.paused_timeout or self.empty_timeout
+        ):
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        """
+        Stop the sweep loop.
+        """
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Failed to reap idle players: {e}")
+
+    async def sweep(self) -> int:
+        """
+        Check every player once and reclaim the ones past a threshold.
+        Returns how many players were reclaimed.
+        """
+        if not self.client.lavalink:
+            return 0
+        players = dict(self.client.lavalink.player_manager.players)
+        for timers in (self._idle_since, self._paused_since, self._empty_since):
+            for guild_id in timers.keys() - players.keys():
+                del timers[guild_id]
+
+        reclaimed = 0
+        for guild_id, player in players.items():
+            if self._reap_reason(guild_id, player) is None:
+                continue
+            # Re-checked on the guild's actor, a command may have got in first
+            if await self.client.actors.run(
+                guild_id, lambda guild_id=guild_id: self._reap(guild_id)
+            ):
+                reclaimed += 1
+
+        if reclaimed:
+            self.reclaimed += reclaimed
+            logger.info(
+                f"Reclaimed {reclaimed} idle player(s), {self.reclaimed} in total"
+            )
+        return reclaimed
+
+    async def _reap(self, guild_id: int) -> bool:
+        player = self.client.lavalink.player_manager.get(guild_id)
+        if not player:
+            return False
+        reason = self._reap_reason(guild_id, player)
+        if reason is None:
+            return False
+
+        logger.info(f"Disconnecting player in guild {guild_id}: {reason}")
+        await self.client.disconnect_from_voice(guild_id)
+        self.client.queues.pop(guild_id, None)
+        self._idle_since.pop(guild_id, None)
+        self._paused_since.pop(guild_id, None)
+        self._empty_since.pop(guild_id, None)
+        return True
+
+    def _reap_reason(self, guild_id: int, player: lavalink.DefaultPlayer) -> str | None:
+        """
+        Update the idle and empty timers for a guild and say why its player
+        should go, or None if it should stay.
+        """
+        now = time.monotonic()
+        if player.is_playing:
+            self._idle_since.pop(guild_id, None)
+            if not player.paused:
+                self._paused_since.pop(guild_id, None)
+            elif self.paused_timeout:
+                since = self._paused_since.setdefault(guild_id, now)
+                if now - since >= self.paused_timeout:
+                    return f"paused for {int(now - since)}s"
+        else:
+            self._paused_since.pop(guild_id, None)
+            if self.idle_timeout:
+                since = self._idle_since.setdefault(guild_id, now)
+                if now - since >= self.idle_timeout:
+                    return f"nothing played for {int(now - since)}s"
+
+        if self.empty_timeout:
+            if self._listener_count(guild_id, player.channel_id):
+                self._empty_since.pop(guild_id, None)
+            else:
+                since = self._empty_since.setdefault(guild_id, now)
+                if now - since >= self.empty_timeout:
+                    return f"no listeners for {int(now - since)}s"
+        return None
+
+    def _listener_count(self, guild_id: int, channel_id: int | None) -> int:
+        """
+        Number of non-bot users in a voice channel, from the cache.
+        """
+        if channel_id is None:
+            return 0
+        states = self.client.bot.cache.get_voice_states_view_for_channel(
+            guild_id, channel_id
+        )
+        return sum(1 for state in states.values() if not state.member.is_bot)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Players reclaimed so far and guilds currently counting down.
+        """
+        return {
+            "reclaimed": self.reclaimed,
+            "idle": len(self._idle_since),
+            "paused": len(self._paused_since),
+            "empty": len(self._empty_since),
+        }
@@ -0,0 +1,278 @@
+"""
+This module persists music queues to a local SQLite database so they survive
+a bot restart without having to search lavalink for every track again.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import sqlite3
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+import lavalink
+
+from src.trackqueue import QueueTrack, TrackQueue
+
+logger = logging.getLogger(__name__)
+
+# Slot used for the track that was playing when the snapshot was taken
+NOW_PLAYING_SLOT = -1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_state (
+    guild_id INTEGER PRIMARY KEY,
+    channel_id INTEGER,
+    position INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queue_tracks (
+    guild_id INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    track TEXT NOT NULL,
+    requester_id INTEGER NOT NULL,
+    requester_name TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (guild_id, slot)
+);
+"""
+
+
+@dataclass
+class GuildSnapshot:
+    """
+    The saved music state of one guild.
+    """
+
+    guild_id: int
+    channel_id: int | None = None
+    position: int = 0
+    now_playing: QueueTrack | None = None
+    tracks: list[QueueTrack] = field(default_factory=list)
+
+
+def _track_row(guild_id: int, slot: int, queue_track: QueueTrack) -> tuple:
+    # raw holds the encoded track plus its info, enough to rebuild the
+    # AudioTrack without asking lavalink
+    return (
+        guild_id,
+        slot,
+        json.dumps(queue_track.track.raw),
+        queue_track.requester_id,
+        queue_track.requester_name,
+        queue_track.added_at,
+    )
+
+
+class QueueStore:
+    """
+    Saves guild queues to SQLite in WAL mode.
+
+    Nothing is written when a queue changes. Instead a background task wakes up
+    every save interval, finds every guild whose marker (queue version and
+    current track) moved since the last save, and rewrites them all in one
+    transaction. Guilds where only the playback position moved just have
+    their position updated. Closing the store waits for a write in progress
+    and then saves once more.
+    """
+
+    def __init__(self, path: str, save_interval: float = 5.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._saved: dict[int, tuple] = {}
+        self._positions: dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._writing: asyncio.Future | None = None
+
+    def load(self) -> list[GuildSnapshot]:
+        """
+        Read every saved guild back into snapshots.
+        """
+        snapshots: dict[int, GuildSnapshot] = {}
+        for guild_id, channel_id, position in self._conn.execute(
+            "SELECT guild_id, channel_id, position FROM guild_state"
+        ):
+            snapshots[guild_id] = GuildSnapshot(guild_id, channel_id, position)
+
+        rows = self._conn.execute(
+            "SELECT guild_id, slot, track, requester_id, requester_name, added_at "
+            "FROM queue_tracks ORDER BY guild_id, slot"
+        )
+        for guild_id, slot, raw, requester_id, requester_name, added_at in rows:
+            snapshot = snapshots.setdefault(guild_id, GuildSnapshot(guild_id))
+            try:
+                track = lavalink.AudioTrack(json.loads(raw), requester_id)
+            except Exception as e:
+                logger.warning(
+                    f"Skipping unreadable saved track in guild {guild_id}: {e}"
+                )
+                continue
+            queue_track = QueueTrack(
+                track, requester_id, requester_name, added_at, restored=True
+            )
+            if slot == NOW_PLAYING_SLOT:
+                snapshot.now_playing = queue_track
+            else:
+                snapshot.tracks.append(queue_track)
+
+        return [s for s in snapshots.values() if s.now_playing or s.tracks]
+
+    def start(
+        self,
+        markers: Callable[[], dict[int, tuple]],
+        build: Callable[[int], GuildSnapshot],
+        positions: Callable[[], dict[int, int]],
+    ) -> None:
+        """
+        Start the background save loop.
+        markers() returns a cheap marker per guild that changes whenever its
+        queue or current track does, build(guild_id) produces the full
+        snapshot to write and positions() the playback position per guild.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(markers, build, positions))
+
+    async def _run(self, markers, build, positions) -> None:
+        while True:
+            await asyncio.sleep(self.save_interval)
+            try:
+                await self.save(markers(), build, positions())
+            except Exception as e:
+                logger.error(f"Failed to save music queues: {e}")
+
+    async def save(
+        self,
+        markers: dict[int, tuple],
+        build: Callable[[int], GuildSnapshot],
+        positions: dict[int, int] | None = None,
+    ) -> int:
+        """
+        Rewrite every guild whose marker changed since the last save, update
+        the position of guilds where only that moved, and remove guilds that
+        no longer have any state. Returns how many guilds were written.
+        """
+        async with self._lock:
+            changed = {
+                guild_id: marker
+                for guild_id, marker in markers.items()
+                if self._saved.get(guild_id) != marker
+            }
+            moved = {
+                guild_id: position
+                for guild_id, position in (positions or {}).items()
+                if guild_id in self._saved
+                and guild_id in markers
+                and guild_id not in changed
+                and self._positions.get(guild_id) != position
+            }
+            removed = [guild_id for guild_id in self._saved if guild_id not in markers]
+            if not changed and not moved and not removed:
+                return 0
+
+            snapshots = [build(guild_id) for guild_id in changed]
+            # Shielded so that close() can wait for the thread if the save
+            # loop is cancelled while it runs
+            self._writing = asyncio.ensure_future(
+                asyncio.to_thread(self._write, snapshots, moved, removed)
+            )
+            await asyncio.shield(self._writing)
+            self._saved.update(changed)
+            self._positions.update(moved)
+            self._positions.update((s.guild_id, s.position) for s in snapshots)
+            for guild_id in removed:
+                del self._saved[guild_id]
+                self._positions.pop(guild_id, None)
+            logger.debug(
+                f"Saved {len(changed)} music queue(s), {len(moved)} position(s), "
+                f"removed {len(removed)}"
+            )
+            return len(changed) + len(moved) + len(removed)
+
+    def _write(
+        self, snapshots: list[GuildSnapshot], moved: dict[int, int], removed: list[int]
+    ) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE guild_state SET position = ?, updated_at = ? WHERE guild_id = ?",
+                [
+                    (position, time.time(), guild_id)
+                    for guild_id, position in moved.items()
+                ],
+            )
+            for guild_id in removed + [s.guild_id for s in snapshots]:
+                self._conn.execute(
+                    "DELETE FROM guild_state WHERE guild_id = ?", (guild_id,)
+                )
+                self._conn.execute(
+                    "DELETE FROM queue_tracks WHERE guild_id = ?", (guild_id,)
+                )
+            for snapshot in snapshots:
+                if not snapshot.now_playing and not snapshot.tracks:
+                    continue
+                self._conn.execute(
+                    "INSERT INTO guild_state (guild_id, channel_id, position, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        snapshot.guild_id,
+                        snapshot.channel_id,
+                        snapshot.position,
+                        time.time(),
+                    ),
+                )
+                rows = [
+                    _track_row(snapshot.guild_id, slot, queue_track)
+                    for slot, queue_track in enumerate(snapshot.tracks)
+                ]
+                if snapshot.now_playing:
+                    rows.append(
+                        _track_row(
+                            snapshot.guild_id, NOW_PLAYING_SLOT, snapshot.now_playing
+                        )
+                    )
+                self._conn.executemany(
+                    "INSERT INTO queue_tracks "
+                    "(guild_id, slot, track, requester_id, requester_name, added_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    async def close(
+        self,
+        markers: dict[int, tuple],
+        build: Callable[[int], GuildSnapshot],
+        positions: dict[int, int] | None = None,
+    ) -> None:
+        """
+        Stop the save loop, wait for any write it had in progress, save what
+        changed since and close the database.
+        """
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._writing:
+            # The loop's thread may still be writing even though it was cancelled
+            await asyncio.gather(self._writing, return_exceptions=True)
+        await self.save(markers, build, positions)
+        self._conn.close()
+
+
+def restore_queue(snapshot: GuildSnapshot) -> TrackQueue:
+    """
+    Build a guild queue from a snapshot, with the interrupted track first so
+    it resumes where it left off.
+    """
+    queue = TrackQueue(snapshot.tracks)
+    if snapshot.now_playing:
+        snapshot.now_playing.start_position = snapshot.position
+        queue.appendleft(snapshot.now_playing)
+    return queue
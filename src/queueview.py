@@ -0,0 +1,176 @@
+"""
+This module contains the paginated view used by the queue command.
+"""
+
+import logging
+import math
+
+import hikari
+import miru
+
+from src.trackqueue import TrackQueue
+
+logger = logging.getLogger(__name__)
+
+# Tracks shown per page
+PAGE_SIZE = 10
+
+
+def format_duration(milliseconds: int) -> str:
+    """
+    Format a track length as m:ss.
+    """
+    minutes = milliseconds // 60000
+    seconds = (milliseconds % 60000) // 1000
+    return f"{minutes}:{seconds:02d}"
+
+
+class QueuePages:
+    """
+    Renders pages of a guild queue on demand.
+
+    Only the tracks on the requested page are read from the queue. Rendered
+    pages are kept until the queue's version changes, so paging back and
+    forth over an unchanged queue doesn't render anything twice.
+    """
+
+    def __init__(self, queue: TrackQueue, page_size: int = PAGE_SIZE):
+        self.queue = queue
+        self.page_size = page_size
+        self._version = queue.version
+        self._pages: dict[int, str] = {}
+
+    @property
+    def page_count(self) -> int:
+        return max(1, math.ceil(len(self.queue) / self.page_size))
+
+    def render(self, page: int) -> str:
+        """
+        Text for one page of the queue, numbered from the start of the queue.
+        """
+        if self.queue.version != self._version:
+            self._pages.clear()
+            self._version = self.queue.version
+
+        cached = self._pages.get(page)
+        if cached is not None:
+            return cached
+
+        start = page * self.page_size
+        lines = []
+        for offset, queue_track in enumerate(
+            self.queue[start : start + self.page_size], start=start + 1
+        ):
+            track = queue_track.track
+            lines.append(
+                f"`{offset}.` **{track.title}** by {track.author} [{format_duration(track.duration)}]\n"
+                f"     👤 {queue_track.requester_name}"
+            )
+        text = "\n".join(lines)
+        self._pages[page] = text
+        return text
+
+
+class QueueView(miru.View):
+    """
+    Queue embed with buttons for moving between pages.
+    """
+
+    def __init__(self, music_client, guild_id: int, queue: TrackQueue):
+        super().__init__(timeout=120)
+        self.music_client = music_client
+        self.guild_id = guild_id
+        self.pages = QueuePages(queue)
+        self.page = 0
+
+    async def build_embed(self) -> hikari.Embed:
+        """
+        Build the embed for the current page.
+        """
+        embed = hikari.Embed(title="🎵 Music Queue", color=hikari.Color(0x3498DB))
+
+        current_track = await self.music_client.get_current_track(self.guild_id)
+        if current_track:
+            status = (
+                "⏸️ Paused"
+                if await self.music_client.is_paused(self.guild_id)
+                else "▶️ Playing"
+            )
+            embed.add_field(
+                name=f"{status} - Now Playing",
+                value=f"**{current_track.title}** by {current_track.author} [{format_duration(current_track.duration)}]",
+                inline=False,
+            )
+
+        queue = self.pages.queue
+        # The queue may have shrunk since the last page was shown
+        self.page = min(self.page, self.pages.page_count - 1)
+        if queue:
+            embed.add_field(
+                name=f"📜 Up Next ({len(queue)} tracks)",
+                value=self.pages.render(self.page),
+                inline=False,
+            )
+
+            total_minutes = queue.total_duration // 60000
+            total_hours = total_minutes // 60
+            total_minutes %= 60
+            if total_hours > 0:
+                duration_display = f"{total_hours}h {total_minutes}m"
+            else:
+                duration_display = f"{total_minutes}m"
+            embed.set_footer(
+                text=f"Page {self.page + 1}/{self.pages.page_count} • Total queue duration: {duration_display}"
+            )
+        else:
+            embed.add_field(name="📜 Up Next", value="Nothing queued.", inline=False)
+
+        self._update_buttons()
+        return embed
+
+    def _update_buttons(self) -> None:
+        last_page = self.pages.page_count - 1
+        for item in self.children:
+            if item.custom_id in ("queue_first", "queue_previous"):
+                item.disabled = self.page == 0
+            elif item.custom_id in ("queue_next", "queue_last"):
+                item.disabled = self.page >= last_page
+
+    async def _show(self, ctx: miru.ViewContext, page: int) -> None:
+        self.page = page
+        await ctx.edit_response(embed=await self.build_embed(), components=self)
+
+    @miru.button(emoji="⏮️", custom_id="queue_first", style=hikari.ButtonStyle.SECONDARY)
+    async def first(self, ctx: miru.ViewContext, button: miru.Button) -> None:
+        await self._show(ctx, 0)
+
+    @miru.button(
+        emoji="◀️", custom_id="queue_previous", style=hikari.ButtonStyle.SECONDARY
+    )
+    async def previous(self, ctx: miru.ViewContext, button: miru.Button) -> None:
+        await self._show(ctx, max(0, self.page - 1))
+
+    @miru.button(
+        emoji="🔄", custom_id="queue_refresh", style=hikari.ButtonStyle.SECONDARY
+    )
+    async def refresh(self, ctx: miru.ViewContext, button: miru.Button) -> None:
+        await self._show(ctx, self.page)
+
+    @miru.button(emoji="▶️", custom_id="queue_next", style=hikari.ButtonStyle.SECONDARY)
+    async def next(self, ctx: miru.ViewContext, button: miru.Button) -> None:
+        await self._show(ctx, self.page + 1)
+
+    @miru.button(emoji="⏭️", custom_id="queue_last", style=hikari.ButtonStyle.SECONDARY)
+    async def last(self, ctx: miru.ViewContext, button: miru.Button) -> None:
+        await self._show(ctx, self.pages.page_count - 1)
+
+    async def on_timeout(self) -> None:
+        """
+        Remove the buttons once the view stops listening.
+        """
+        if self.message is None:
+            return
+        try:
+            await self.message.edit(components=[])
+        except hikari.HTTPError as e:
+            logger.debug(f"Could not remove queue buttons: {e}")
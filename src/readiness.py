@@ -0,0 +1,61 @@
+"""
+This module contains a small helper for waiting on connection readiness
+without sleep-polling.
+"""
+
+import asyncio
+from collections.abc import Callable, Hashable
+
+
+class ReadinessWaiter:
+    """
+    Keeps futures per key (a guild ID, or a name like "nodes") that are woken
+    whenever an event that could change readiness for that key arrives.
+    """
+
+    def __init__(self):
+        self._waiters: dict[Hashable, list[asyncio.Future]] = {}
+
+    async def wait(
+        self, key: Hashable, is_ready: Callable[[], bool], timeout: float
+    ) -> bool:
+        """
+        Wait until is_ready() returns True, re-checking every time key is notified.
+        Returns False if it is still not ready once the timeout runs out.
+        """
+        if is_ready():
+            return True
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return is_ready()
+
+            future = loop.create_future()
+            self._waiters.setdefault(key, []).append(future)
+            try:
+                await asyncio.wait_for(future, remaining)
+            except TimeoutError:
+                return is_ready()
+            finally:
+                self._discard(key, future)
+
+            if is_ready():
+                return True
+
+    def notify(self, key: Hashable) -> None:
+        """
+        Wake everything waiting on key so it re-checks its condition.
+        """
+        for future in self._waiters.pop(key, []):
+            if not future.done():
+                future.set_result(None)
+
+    def _discard(self, key: Hashable, future: asyncio.Future) -> None:
+        waiters = self._waiters.get(key)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._waiters[key]
@@ -0,0 +1,86 @@
+"""
+This module posts a reply to Discord while it is still being generated,
+editing the message as more text arrives.
+"""
+
+import logging
+import time
+from collections.abc import AsyncIterator
+
+import hikari
+
+from src.constants import REPLY_ERROR
+
+logger = logging.getLogger(__name__)
+
+# Discord rejects messages longer than this
+MAX_MESSAGE_LENGTH = 2000
+
+
+class StreamedReply:
+    """
+    Replies to a message with text that grows over time.
+
+    The reply is posted as soon as there is any text, then edited at most
+    once per edit_interval. Discord allows about five edits of a message
+    per five seconds, and edits beyond that are queued behind a rate limit
+    and delay the rest of the stream. Text that arrives between edits is
+    batched into the next one, and the final text is always written.
+    """
+
+    def __init__(self, message: hikari.Message, edit_interval: float):
+        self.message = message
+        self.edit_interval = edit_interval
+        self.reply: hikari.Message | None = None
+        self.edits: int = 0
+        self._shown: str = ""
+        self._last_edit: float = 0.0
+
+    async def run(self, chunks: AsyncIterator[str]) -> str:
+        """
+        Consume the text from chunks, each being the whole reply so far.
+        Returns the final text.
+        """
+        started = time.perf_counter()
+        text = ""
+        try:
+            async for text in chunks:
+                if self.reply is None and text.strip():
+                    logger.debug(
+                        f"First reply text after {time.perf_counter() - started:.2f}s"
+                    )
+                    await self._post(text)
+                elif time.perf_counter() - self._last_edit >= self.edit_interval:
+                    await self._edit(text)
+        except Exception as e:
+            logger.error(f"Error generating reply: {e}")
+            if self.reply is None:
+                await self._post(REPLY_ERROR)
+                return REPLY_ERROR
+            # Leave what was already written rather than replace it
+            return self._shown
+
+        if self.reply is None:
+            if text.strip():
+                await self._post(text)
+        else:
+            await self._edit(text)
+        logger.debug(
+            f"Reply streamed in {time.perf_counter() - started:.2f}s"
+            f" with {self.edits} edits"
+        )
+        return text
+
+    async def _post(self, text: str) -> None:
+        self._shown = text[:MAX_MESSAGE_LENGTH]
+        self.reply = await self.message.respond(self._shown, reply=self.message)
+        self._last_edit = time.perf_counter()
+
+    async def _edit(self, text: str) -> None:
+        text = text[:MAX_MESSAGE_LENGTH]
+        if self.reply is None or text == self._shown or not text.strip():
+            return
+        self._shown = text
+        self.reply = await self.reply.edit(text)
+        self._last_edit = time.perf_counter()
+        self.edits += 1
@@ -0,0 +1,50 @@
+"""
+This module keeps track of how long each phase of startup takes.
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """
+    Records the duration of named startup phases, in the order they ran.
+    Phases can be timed with a with block, or started and finished
+    separately when they span event handlers.
+    """
+
+    def __init__(self, created: float | None = None):
+        self.created = created if created is not None else time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.reported: bool = False
+        self._started: dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+
+    def start(self, name: str) -> None:
+        self._started[name] = time.perf_counter()
+
+    def finish(self, name: str) -> None:
+        started = self._started.pop(name, None)
+        if started is not None:
+            self.phases[name] = time.perf_counter() - started
+
+    @contextmanager
+    def phase(self, name: str):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.finish(name)
+
+    def summary(self) -> str:
+        """
+        One line breakdown of every finished phase, plus the time since the
+        timer was created.
+        """
+        parts = [
+            f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases.items()
+        ]
+        total = time.perf_counter() - self.created
+        return f"{', '.join(parts)} (total {total * 1000:.0f}ms)"
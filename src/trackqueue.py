@@ -0,0 +1,290 @@
+"""
+This module contains the per-guild track queue used by the music client.
+"""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import overload
+
+import lavalink
+
+
+@dataclass
+class QueueTrack:
+    """
+    Represents a track in the queue with additional metadata.
+    """
+
+    track: lavalink.AudioTrack
+    requester_id: int
+    requester_name: str
+    added_at: float
+    validated: bool = False
+    start_position: int = 0
+    # Read back from the queue database rather than loaded from lavalink
+    restored: bool = False
+
+
+class _BlockSizes:
+    """
+    A Fenwick tree over the sizes of a queue's blocks, which finds the block
+    holding a position, and updates a block's size, in O(log n).
+    """
+
+    def __init__(self, sizes: list[int]):
+        self._tree = [0, *sizes]
+        for i in range(1, len(self._tree)):
+            parent = i + (i & -i)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[i]
+
+    def add(self, block_index: int, delta: int) -> None:
+        i = block_index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def find(self, position: int) -> tuple[int, int]:
+        """
+        Index of the block holding the given position, and the offset in it.
+        """
+        block_index = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            candidate = block_index + step
+            if candidate < len(self._tree) and self._tree[candidate] <= position:
+                position -= self._tree[candidate]
+                block_index = candidate
+            step >>= 1
+        return block_index, position
+
+
+class TrackQueue:
+    """
+    A queue of tracks for a single guild.
+
+    Tracks are stored in a list of small blocks (an unrolled list). Appending
+    and popping at either end only touch the first or last block. Inserting
+    or removing at an index finds its block through a Fenwick tree of block
+    sizes in O(log n), then edits that one block. Blocks that fill up are
+    split and blocks that drop below half full are merged with a neighbour.
+    Those change the block layout, so the tree is rebuilt the next time an
+    index is looked up, once per BLOCK_SIZE / 2 edits at worst.
+
+    The number of tracks and the total duration are kept as running totals so
+    that displaying the queue never has to re-scan it. version is bumped on
+    every change, so callers can tell when a saved copy is stale.
+    """
+
+    BLOCK_SIZE = 64
+
+    def __init__(self, tracks: list[QueueTrack] | None = None):
+        self._blocks: list[list[QueueTrack]] = []
+        self._sizes: _BlockSizes | None = None
+        self._length: int = 0
+        self._total_duration: int = 0
+        self.version: int = 0
+        if tracks:
+            self.extend(tracks)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __iter__(self) -> Iterator[QueueTrack]:
+        for block in self._blocks:
+            yield from block
+
+    @overload
+    def __getitem__(self, index: int) -> QueueTrack: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[QueueTrack]: ...
+
+    def __getitem__(self, index: int | slice) -> QueueTrack | list[QueueTrack]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return list(self)[index]
+            return self._slice(start, stop)
+        block, offset = self._locate(index)
+        return block[offset]
+
+    def __repr__(self) -> str:
+        return f"TrackQueue(tracks={self._length}, duration={self._total_duration}ms)"
+
+    @property
+    def total_duration(self) -> int:
+        """
+        Total duration of every queued track, in milliseconds.
+        """
+        return self._total_duration
+
+    def append(self, item: QueueTrack) -> None:
+        """
+        Add a track to the end of the queue.
+        """
+        if not self._blocks or len(self._blocks[-1]) >= self.BLOCK_SIZE:
+            self._blocks.append([])
+            self._sizes = None
+        elif self._sizes is not None:
+            self._sizes.add(len(self._blocks) - 1, 1)
+        self._blocks[-1].append(item)
+        self._added(item)
+
+    def appendleft(self, item: QueueTrack) -> None:
+        """
+        Add a track to the front of the queue.
+        """
+        if not self._blocks or len(self._blocks[0]) >= self.BLOCK_SIZE:
+            self._blocks.insert(0, [])
+            self._sizes = None
+        elif self._sizes is not None:
+            self._sizes.add(0, 1)
+        self._blocks[0].insert(0, item)
+        self._added(item)
+
+    def extend(self, items) -> None:
+        """
+        Add several tracks to the end of the queue.
+        """
+        for item in items:
+            self.append(item)
+
+    def popleft(self) -> QueueTrack:
+        """
+        Remove and return the track at the front of the queue.
+        """
+        if not self._length:
+            raise IndexError("pop from an empty queue")
+        return self._pop_at(0, 0)
+
+    def peek(self) -> QueueTrack | None:
+        """
+        Return the track at the front of the queue without removing it.
+        """
+        if not self._length:
+            return None
+        return self._blocks[0][0]
+
+    def insert(self, index: int, item: QueueTrack) -> None:
+        """
+        Insert a track before the given position. Like list.insert, negative
+        positions count from the end and out of range ones are clamped.
+        """
+        if index < 0:
+            index = max(index + self._length, 0)
+        if index == 0:
+            self.appendleft(item)
+            return
+        if index >= self._length:
+            self.append(item)
+            return
+
+        block_index, offset = self._block_sizes().find(index)
+        block = self._blocks[block_index]
+        block.insert(offset, item)
+        if len(block) > self.BLOCK_SIZE:
+            # Split the overfull block so edits stay bounded by BLOCK_SIZE
+            half = len(block) // 2
+            self._blocks.insert(block_index + 1, block[half:])
+            del block[half:]
+            self._sizes = None
+        else:
+            self._sizes.add(block_index, 1)
+        self._added(item)
+
+    def pop(self, index: int = 0) -> QueueTrack:
+        """
+        Remove and return the track at the given position.
+        """
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("queue index out of range")
+        if index == 0:
+            return self._pop_at(0, 0)
+        return self._pop_at(*self._block_sizes().find(index))
+
+    def replace_track(self, item: QueueTrack, track: lavalink.AudioTrack) -> None:
+        """
+        Swap the lavalink track of a queued item, keeping the totals correct.
+        """
+        self._total_duration += track.duration - item.track.duration
+        item.track = track
+        self.version += 1
+
+    def clear(self) -> None:
+        """
+        Remove every track from the queue.
+        """
+        self._blocks.clear()
+        self._sizes = None
+        self._length = 0
+        self._total_duration = 0
+        self.version += 1
+
+    def _added(self, item: QueueTrack) -> None:
+        self._length += 1
+        self._total_duration += item.track.duration
+        self.version += 1
+
+    def _removed(self, item: QueueTrack) -> None:
+        self._length -= 1
+        self._total_duration -= item.track.duration
+        self.version += 1
+
+    def _pop_at(self, block_index: int, offset: int) -> QueueTrack:
+        block = self._blocks[block_index]
+        item = block.pop(offset)
+        if not block:
+            del self._blocks[block_index]
+            self._sizes = None
+        elif len(block) < self.BLOCK_SIZE // 2 and self._merge(block_index):
+            self._sizes = None
+        elif self._sizes is not None:
+            self._sizes.add(block_index, -1)
+        self._removed(item)
+        return item
+
+    def _merge(self, block_index: int) -> bool:
+        """
+        Fold a block that dropped below half full into a neighbour it fits
+        in, so removals from the middle can't leave many tiny blocks behind.
+        """
+        for left in (block_index - 1, block_index):
+            right = left + 1
+            if left < 0 or right >= len(self._blocks):
+                continue
+            if len(self._blocks[left]) + len(self._blocks[right]) <= self.BLOCK_SIZE:
+                self._blocks[left].extend(self._blocks[right])
+                del self._blocks[right]
+                return True
+        return False
+
+    def _block_sizes(self) -> _BlockSizes:
+        if self._sizes is None:
+            self._sizes = _BlockSizes([len(block) for block in self._blocks])
+        return self._sizes
+
+    def _locate(self, index: int) -> tuple[list[QueueTrack], int]:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("queue index out of range")
+        block_index, offset = self._block_sizes().find(index)
+        return self._blocks[block_index], offset
+
+    def _slice(self, start: int, stop: int) -> list[QueueTrack]:
+        result: list[QueueTrack] = []
+        if start >= stop:
+            return result
+        block_index, offset = self._block_sizes().find(start)
+        while len(result) < stop - start:
+            block = self._blocks[block_index]
+            result.extend(block[offset : offset + stop - start - len(result)])
+            block_index += 1
+            offset = 0
+        return result
@@ -0,0 +1,103 @@
+"""
+This module passes Discord voice events on to lavalink, dropping the ones
+lavalink has no use for.
+"""
+
+import logging
+from collections import Counter
+
+import hikari
+
+from src import lavaclient
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceEventRouter:
+    """
+    Forwards voice state and voice server updates to lavalink.
+
+    Only the bot's own voice state matters to lavalink, and only in guilds
+    where it has a player, yet Discord sends every user's voice changes in
+    every guild. Those are dropped after a user ID comparison, before any
+    payload is built.
+    """
+
+    def __init__(self):
+        self.bot_user_id: hikari.Snowflake | None = None
+        self.forwarded: int = 0
+        self.dropped: Counter = Counter()
+
+    def subscribe(self, bot: hikari.GatewayBot) -> None:
+        """
+        Listen for voice events on the bot.
+        """
+        bot.subscribe(hikari.VoiceStateUpdateEvent, self.on_voice_state_update)
+        bot.subscribe(hikari.VoiceServerUpdateEvent, self.on_voice_server_update)
+
+    def _player_client(self, guild_id: hikari.Snowflake):
+        """
+        The music client, if it has a player in the guild.
+        """
+        client = lavaclient.music_client
+        if not client or not client.lavalink:
+            return None
+        if not client.lavalink.player_manager.get(int(guild_id)):
+            return None
+        return client
+
+    async def on_voice_state_update(self, event: hikari.VoiceStateUpdateEvent) -> None:
+        state = event.state
+        if self.bot_user_id is None or state.user_id != self.bot_user_id:
+            self.dropped["other_user"] += 1
+            return
+        client = self._player_client(event.guild_id)
+        if client is None:
+            self.dropped["no_player"] += 1
+            return
+
+        self.forwarded += 1
+        lava_data = {
+            "t": "VOICE_STATE_UPDATE",
+            "d": {
+                "guild_id": str(event.guild_id),
+                "user_id": str(self.bot_user_id),
+                "session_id": state.session_id,
+                "channel_id": str(state.channel_id) if state.channel_id else None,
+            },
+        }
+        logger.debug(f"Voice state update data: {lava_data}")
+        await client.lavalink.voice_update_handler(lava_data)
+        client.notify_voice_update(int(event.guild_id))
+
+    async def on_voice_server_update(
+        self, event: hikari.VoiceServerUpdateEvent
+    ) -> None:
+        client = self._player_client(event.guild_id)
+        if client is None:
+            self.dropped["no_player"] += 1
+            return
+        if event.endpoint is None:
+            # Discord sends this while the voice server is being reassigned
+            self.dropped["no_endpoint"] += 1
+            return
+
+        self.forwarded += 1
+        lava_data = {
+            "t": "VOICE_SERVER_UPDATE",
+            "d": {
+                "guild_id": str(event.guild_id),
+                "token": event.token,
+                # Remove "wss://" prefix
+                "endpoint": event.endpoint[6:],
+            },
+        }
+        logger.debug(f"Voice server update data: {lava_data}")
+        await client.lavalink.voice_update_handler(lava_data)
+        client.notify_voice_update(int(event.guild_id))
+
+    def stats(self) -> dict[str, int]:
+        """
+        Events forwarded to lavalink and dropped, by reason.
+        """
+        return {"forwarded": self.forwarded, **self.dropped}
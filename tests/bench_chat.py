@@ -0,0 +1,310 @@
+"""
+Benchmark for the chat pipeline with a local stand-in for the LLM.
+
+Replaces the agent's model with a pydantic-ai FunctionModel that produces
+tokens at a fixed rate, then feeds synthetic MESSAGE_CREATE gateway events
+from many channels into the bot's real on_payload handler, through the
+mention filter and the mention batcher, and reports:
+  - pre-model overhead, from the event arriving to the model being called
+    (filtering, batching, scheduler wait, history lookup, prompt building)
+  - model time, as spent inside the stand-in model
+  - first text, from the event arriving to the first message sent
+  - post-model overhead, from the model finishing to the reply being final
+  - total time until the reply is final and overall throughput
+
+Sending and editing messages is faked at the REST client, everything in
+front of it is the bot's own code.
+
+Run from the repository root:
+    python -m tests.bench_chat --messages 500 --rate 100 --history 10
+"""
+
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from unittest import mock
+
+import hikari
+from hikari.impl import RESTClientImpl
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from tests.bench_lavaclient import summarize
+
+BOT_ID = 100000000000000001
+FIRST_CHANNEL_ID = 300000000000000001
+FIRST_USER_ID = 400000000000000000
+FIRST_MESSAGE_ID = 500000000000000000
+# Well formed but fake, the bot is built but never connects
+BENCH_TOKEN = base64.b64encode(str(BOT_ID).encode()).decode() + ".bench.token"
+# Ties a model call back to the messages that caused it
+MESSAGE_ID_RE = re.compile(r"#(\d+)")
+
+
+class Timings:
+    """
+    Timestamps per benchmark message, keyed by message number.
+    """
+
+    def __init__(self):
+        self.points: dict[int, dict[str, float]] = defaultdict(dict)
+
+    def mark(self, number: int, point: str) -> None:
+        self.points[number].setdefault(point, time.perf_counter())
+
+    def stage(self, start: str, end: str) -> list[float]:
+        return [
+            points[end] - points[start]
+            for points in self.points.values()
+            if start in points and end in points
+        ]
+
+
+class FakeReply:
+    """
+    A sent message, which records when it was last edited.
+    """
+
+    def __init__(self, timings: Timings, number: int, latency: float):
+        self.timings = timings
+        self.number = number
+        self.latency = latency
+
+    async def edit(self, content: str) -> "FakeReply":
+        await asyncio.sleep(self.latency)
+        self.timings.points[self.number]["final"] = time.perf_counter()
+        return self
+
+
+def fake_create_message(timings: Timings, latency: float):
+    """
+    Stand-in for RESTClientImpl.create_message, for replies to benchmark
+    messages.
+    """
+
+    async def create_message(rest, channel, content=None, *, reply, **kwargs):
+        number = int(reply.id) - FIRST_MESSAGE_ID
+        await asyncio.sleep(latency)
+        timings.mark(number, "first_text")
+        timings.points[number]["final"] = time.perf_counter()
+        return FakeReply(timings, number, latency)
+
+    return create_message
+
+
+def message_payload(number: int, channel_id: int) -> dict:
+    """
+    A MESSAGE_CREATE payload for a human mentioning the bot.
+    """
+    user = number % 37
+    return {
+        "id": str(FIRST_MESSAGE_ID + number),
+        "channel_id": str(channel_id),
+        "author": {
+            "id": str(FIRST_USER_ID + user),
+            "username": f"user{user}",
+            "global_name": None,
+            "discriminator": "0",
+            "avatar": None,
+        },
+        "content": f"<@{BOT_ID}> benchmark message #{number}, what do you think?",
+        "timestamp": "2026-01-01T00:00:00+00:00",
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [
+            {
+                "id": str(BOT_ID),
+                "username": "Dolores",
+                "discriminator": "0",
+                "avatar": None,
+                "bot": True,
+            }
+        ],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+        "flags": 0,
+    }
+
+
+def make_model(timings: Timings, args) -> FunctionModel:
+    """
+    A model that waits first_token seconds, then produces args.tokens words
+    token_latency seconds apart. A batch of messages gets a numbered reply
+    to each.
+    """
+
+    def message_numbers(messages: list[ModelMessage]) -> list[int]:
+        for part in messages[-1].parts:
+            if isinstance(part, UserPromptPart):
+                return [int(n) for n in MESSAGE_ID_RE.findall(str(part.content))]
+        return []
+
+    def reply_text(numbers: list[int]) -> str:
+        words = "word " * args.tokens
+        if len(numbers) <= 1:
+            return words
+        return "\n".join(f"[{i}] {words}" for i in range(1, len(numbers) + 1))
+
+    def mark(numbers: list[int], point: str) -> None:
+        for number in numbers:
+            timings.mark(number, point)
+
+    async def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        numbers = message_numbers(messages)
+        mark(numbers, "model_start")
+        await asyncio.sleep(args.first_token + args.token_latency * args.tokens)
+        mark(numbers, "model_end")
+        return ModelResponse(parts=[TextPart(reply_text(numbers))])
+
+    async def stream(messages: list[ModelMessage], info: AgentInfo):
+        numbers = message_numbers(messages)
+        mark(numbers, "model_start")
+        await asyncio.sleep(args.first_token)
+        for _ in range(args.tokens):
+            yield "word "
+            await asyncio.sleep(args.token_latency)
+        mark(numbers, "model_end")
+
+    return FunctionModel(respond, stream_function=stream)
+
+
+def seed_history(chat_inst, channel_id: int, messages: int) -> None:
+    """
+    Fill a channel's history with messages/2 earlier exchanges.
+    """
+    history: list[ModelMessage] = []
+    for i in range(messages // 2):
+        history.append(
+            ModelRequest(parts=[UserPromptPart(f"earlier message {i} " * 8)])
+        )
+        history.append(ModelResponse(parts=[TextPart(f"earlier reply {i} " * 8)]))
+    chat_inst.history.extend(channel_id, history)
+
+
+async def run(args) -> None:
+    os.environ["DISCORD_API_KEY"] = BENCH_TOKEN
+    os.environ["LLM_MODEL"] = "test"
+    os.environ["LLM_MAX_CONCURRENT"] = str(args.llm_concurrency)
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(args.rpm)
+    os.environ["LLM_BURST"] = str(args.llm_concurrency)
+    os.environ["CHAT_HISTORY_LENGTH"] = str(max(args.history, 10))
+    os.environ.pop("EXPLANATION_CACHE_PATH", None)
+
+    from src import main as bot_main
+    from src.chat import chat
+    from src.explanations import ExplanationService
+    from src.mentionbatcher import MentionBatcher
+
+    timings = Timings()
+    chat_inst = chat()
+    chat_inst.dol_agent.model = make_model(timings, args)
+    chat_inst.hedger.models = [chat_inst.dol_agent.model]
+    bot_main.chat_inst = chat_inst
+    bot_main.explainer = ExplanationService(bot_main.bot, chat_inst)
+    bot_main.mention_filter.set_identity(BOT_ID)
+    bot_main.STREAM_EDIT_INTERVAL = args.edit_interval if args.stream else 0
+    batcher = None
+    if args.batch_size > 1:
+        batcher = MentionBatcher(args.batch_size, bot_main.handle_mentions)
+    bot_main.mention_batcher = batcher
+    for index in range(args.channels):
+        seed_history(chat_inst, FIRST_CHANNEL_ID + index, args.history)
+
+    # Without a batcher on_payload answers inline, so each event gets a task
+    handlers: list[asyncio.Task] = []
+    started = time.perf_counter()
+    with mock.patch.object(
+        RESTClientImpl,
+        "create_message",
+        fake_create_message(timings, args.discord_latency),
+    ):
+        for number in range(args.messages):
+            channel_id = FIRST_CHANNEL_ID + number % args.channels
+            event = hikari.ShardPayloadEvent(
+                app=bot_main.bot,
+                shard=None,
+                name="MESSAGE_CREATE",
+                payload=message_payload(number, channel_id),
+            )
+            timings.mark(number, "start")
+            handlers.append(asyncio.create_task(bot_main.on_payload(event)))
+            await asyncio.sleep(1 / args.rate)
+        await asyncio.gather(*handlers)
+        while batcher and batcher._workers:
+            await asyncio.gather(*batcher._workers.values())
+    elapsed = time.perf_counter() - started
+
+    mode = f"streaming every {args.edit_interval}s" if args.stream else "complete"
+    print(
+        f"{args.messages} messages over {args.channels} channels at "
+        f"{args.rate:.0f}/s, history={args.history}, batches of up to "
+        f"{args.batch_size}, replies {mode}"
+    )
+    print(
+        f"model: first token {args.first_token * 1000:.0f}ms, "
+        f"{args.tokens} tokens at {args.token_latency * 1000:.0f}ms"
+    )
+    print(summarize("pre-model", timings.stage("start", "model_start")))
+    print(summarize("model", timings.stage("model_start", "model_end")))
+    print(summarize("first text", timings.stage("start", "first_text")))
+    print(summarize("post-model", timings.stage("model_end", "final")))
+    print(summarize("total", timings.stage("start", "final")))
+    print(f"throughput: {args.messages / elapsed:.1f} messages/s over {elapsed:.2f}s")
+    if batcher:
+        print(f"batches: {batcher.stats()}")
+    print(f"scheduler: {chat_inst.scheduler.stats()}")
+    print(f"history: {chat_inst.history.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument(
+        "--rate", type=float, default=100, help="messages arriving per second"
+    )
+    parser.add_argument(
+        "--history", type=int, default=10, help="messages of history per channel"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=10, help="mentions per batch, 1 off"
+    )
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per reply")
+    parser.add_argument("--first-token", type=float, default=0.2, help="seconds")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="seconds")
+    parser.add_argument(
+        "--discord-latency", type=float, default=0.05, help="seconds per send/edit"
+    )
+    parser.add_argument("--stream", action="store_true", help="stream replies")
+    parser.add_argument("--edit-interval", type=float, default=1.0, help="seconds")
+    parser.add_argument(
+        "--llm-concurrency", type=int, default=8, help="scheduler concurrency cap"
+    )
+    parser.add_argument(
+        "--rpm", type=float, default=0, help="scheduler requests per minute, 0 off"
+    )
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    os.environ["LOG_LEVEL"] = args.log_level
+    logging.basicConfig(level=args.log_level)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
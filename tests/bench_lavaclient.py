@@ -0,0 +1,243 @@
+"""
+Benchmark for MusicClient against the fake lavalink node.
+
+Drives many guilds at once through connect, search and play with a queue of
+tracks each, then reports:
+  - play-start latency, from a play request to the first TrackStartEvent
+  - transition latency, from a track finishing to the next one starting
+  - event throughput, lavalink events handled per second
+
+Run from the repository root:
+    python -m tests.bench_lavaclient --guilds 200 --tracks 4 --latency 0.01
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import hikari
+import lavalink
+
+from tests.fake_lavalink import FakeLavalink
+
+BOT_ID = 100000000000000001
+FIRST_GUILD_ID = 200000000000000001
+FIRST_CHANNEL_ID = 300000000000000001
+
+
+class FakeBot:
+    """
+    Just enough of hikari.GatewayBot for MusicClient. Voice state changes are
+    answered with the gateway events Discord would send.
+    """
+
+    def __init__(self):
+        self.me = SimpleNamespace(id=hikari.Snowflake(BOT_ID))
+        self.music_client = None
+        self.cache = self
+
+    def get_me(self):
+        return self.me
+
+    def get_voice_states_view_for_channel(self, guild_id, channel_id):
+        return {}
+
+    async def update_voice_state(self, guild_id, channel_id) -> None:
+        asyncio.create_task(self._voice_events(int(guild_id), channel_id))
+
+    async def _voice_events(self, guild_id: int, channel_id) -> None:
+        await asyncio.sleep(0)
+        client = self.music_client
+        await client.lavalink.voice_update_handler(
+            {
+                "t": "VOICE_STATE_UPDATE",
+                "d": {
+                    "guild_id": str(guild_id),
+                    "user_id": str(BOT_ID),
+                    "channel_id": str(channel_id) if channel_id else None,
+                    "session_id": f"session-{guild_id}",
+                },
+            }
+        )
+        if channel_id:
+            await client.lavalink.voice_update_handler(
+                {
+                    "t": "VOICE_SERVER_UPDATE",
+                    "d": {
+                        "guild_id": str(guild_id),
+                        "token": "fake-token",
+                        "endpoint": "fake.discord.media",
+                    },
+                }
+            )
+        client.notify_voice_update(guild_id)
+
+
+class Recorder:
+    """
+    Collects event timings per guild from a generic lavalink event hook.
+    """
+
+    def __init__(self, tracks_per_guild: int):
+        self.tracks_per_guild = tracks_per_guild
+        self.play_requested: dict[int, float] = {}
+        self.play_start: list[float] = []
+        self.transitions: list[float] = []
+        self.events = 0
+        self._last_end: dict[int, float] = {}
+        self._ended: dict[int, int] = defaultdict(int)
+        self._done: dict[int, asyncio.Future] = {}
+
+    def done(self, guild_id: int) -> asyncio.Future:
+        return self._done.setdefault(
+            guild_id, asyncio.get_running_loop().create_future()
+        )
+
+    async def hook(self, event) -> None:
+        now = time.perf_counter()
+        self.events += 1
+        if isinstance(event, lavalink.TrackStartEvent):
+            guild_id = int(event.player.guild_id)
+            requested = self.play_requested.pop(guild_id, None)
+            if requested is not None:
+                self.play_start.append(now - requested)
+            ended = self._last_end.pop(guild_id, None)
+            if ended is not None:
+                self.transitions.append(now - ended)
+        elif isinstance(event, lavalink.TrackEndEvent):
+            if not event.reason.may_start_next():
+                return
+            guild_id = int(event.player.guild_id)
+            self._ended[guild_id] += 1
+            if self._ended[guild_id] >= self.tracks_per_guild:
+                future = self.done(guild_id)
+                if not future.done():
+                    future.set_result(None)
+            else:
+                self._last_end[guild_id] = now
+
+
+def summarize(name: str, samples: list[float]) -> str:
+    if not samples:
+        return f"{name}: no samples"
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return (
+        f"{name}: n={len(ordered)} mean={statistics.fmean(ordered) * 1000:.1f}ms "
+        f"p50={pct(0.50):.1f}ms p95={pct(0.95):.1f}ms p99={pct(0.99):.1f}ms "
+        f"max={ordered[-1] * 1000:.1f}ms"
+    )
+
+
+async def drive_guild(client, recorder: Recorder, index: int, args) -> bool:
+    guild_id = FIRST_GUILD_ID + index
+    channel_id = FIRST_CHANNEL_ID + index
+    started = time.perf_counter()
+    if not await client.connect_to_voice(guild_id, channel_id):
+        return False
+    results = await client.load(f"scsearch:benchmark song {index % args.queries}")
+    if not results or not results.tracks:
+        return False
+
+    recorder.play_requested[guild_id] = started
+    tracks = (results.tracks * args.tracks)[: args.tracks]
+    for track in tracks:
+        if not await client.play_track(guild_id, track, 1, "benchmark"):
+            return False
+    try:
+        await asyncio.wait_for(
+            recorder.done(guild_id), args.tracks * (args.play_time + 5)
+        )
+    except TimeoutError:
+        return False
+    await client.disconnect_from_voice(guild_id)
+    return True
+
+
+async def run(args) -> None:
+    server = FakeLavalink(
+        latency=args.latency,
+        jitter=args.jitter,
+        load_failure_rate=args.load_failure_rate,
+        track_failure_rate=args.track_failure_rate,
+        play_time=args.play_time,
+        seed=args.seed,
+    )
+    port = await server.start()
+
+    os.environ["LAVALINK_HOST"] = "127.0.0.1"
+    os.environ["LAVALINK_PORT"] = str(port)
+    os.environ["PLAYER_IDLE_TIMEOUT"] = "0"
+    os.environ["PLAYER_EMPTY_TIMEOUT"] = "0"
+    os.environ.pop("LAVALINK_NODES", None)
+    os.environ.pop("QUEUE_DB_PATH", None)
+
+    from src.lavaclient import MusicClient
+
+    bot = FakeBot()
+    client = MusicClient(bot)
+    bot.music_client = client
+    if not await client.initialize():
+        await server.stop()
+        raise SystemExit("MusicClient failed to connect to the fake node")
+
+    recorder = Recorder(args.tracks)
+    client.lavalink.add_event_hook(recorder.hook)
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(drive_guild(client, recorder, i, args) for i in range(args.guilds))
+    )
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{args.guilds} guilds x {args.tracks} tracks, latency={args.latency * 1000:.0f}ms "
+        f"jitter={args.jitter * 1000:.0f}ms, play_time={args.play_time}s"
+    )
+    print(f"completed guilds: {sum(outcomes)}/{args.guilds} in {elapsed:.2f}s")
+    print(summarize("play start", recorder.play_start))
+    print(summarize("transition", recorder.transitions))
+    print(
+        f"events: {recorder.events} handled, {recorder.events / elapsed:.0f}/s; "
+        f"server sent {dict(server.events)}"
+    )
+    print(f"server requests: {dict(server.requests)}")
+    print(f"search cache: {client.cache_stats()['search']}")
+
+    await client.close()
+    await client.lavalink.close()
+    await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--guilds", type=int, default=100)
+    parser.add_argument("--tracks", type=int, default=3, help="tracks per guild")
+    parser.add_argument(
+        "--queries", type=int, default=20, help="distinct search queries"
+    )
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds")
+    parser.add_argument("--jitter", type=float, default=0.005, help="seconds")
+    parser.add_argument("--load-failure-rate", type=float, default=0.0)
+    parser.add_argument("--track-failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--play-time", type=float, default=0.2, help="seconds each track plays"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+A stand-in for a Lavalink v4 server, for benchmarking the music client
+without a JVM. It speaks enough of the REST and websocket protocol for
+lavalink.py: loadtracks, player updates, and track start/end events.
+
+Latency and failure rates are configurable so slow or flaky nodes can be
+simulated. Tracks "play" for play_time seconds regardless of their length.
+"""
+
+import asyncio
+import base64
+import json
+import random
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urlparse
+
+from aiohttp import WSMsgType, web
+
+
+def make_track(identifier: str, title: str, source: str = "soundcloud") -> dict:
+    """
+    Build a Lavalink v4 track object.
+    """
+    info = {
+        "identifier": identifier,
+        "isSeekable": True,
+        "author": "Fake Artist",
+        "length": 180000,
+        "isStream": False,
+        "position": 0,
+        "title": title,
+        "uri": f"https://example.com/{source}/{identifier}",
+        "artworkUrl": None,
+        "isrc": None,
+        "sourceName": source,
+    }
+    encoded = base64.b64encode(json.dumps(info).encode()).decode()
+    return {"encoded": encoded, "info": info, "pluginInfo": {}, "userData": {}}
+
+
+class FakePlayer:
+    """
+    Server side state of one guild's player.
+    """
+
+    def __init__(self, guild_id: str):
+        self.guild_id = guild_id
+        self.track: dict | None = None
+        self.paused = False
+        self.volume = 100
+        self.voice: dict = {}
+        self.started_at = 0.0
+        self.end_task: asyncio.Task | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "guildId": self.guild_id,
+            "track": self.track,
+            "volume": self.volume,
+            "paused": self.paused,
+            "state": {
+                "time": int(time.time() * 1000),
+                "position": 0,
+                "connected": bool(self.voice),
+                "ping": 0,
+            },
+            "voice": self.voice,
+            "filters": {},
+        }
+
+
+class FakeLavalink:
+    """
+    A fake Lavalink node on localhost.
+
+    latency and jitter (seconds) delay every REST response and event.
+    load_failure_rate is the chance a loadtracks call returns an error,
+    track_failure_rate the chance a started track fails with an exception
+    instead of playing to the end.
+    """
+
+    def __init__(
+        self,
+        password: str = "youshallnotpass",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        load_failure_rate: float = 0.0,
+        track_failure_rate: float = 0.0,
+        play_time: float = 0.5,
+        search_results: int = 5,
+        seed: int | None = None,
+    ):
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.load_failure_rate = load_failure_rate
+        self.track_failure_rate = track_failure_rate
+        self.play_time = play_time
+        self.search_results = search_results
+        self.random = random.Random(seed)
+
+        self.session_id = uuid.uuid4().hex[:16]
+        self.players: dict[str, FakePlayer] = {}
+        self.requests: Counter = Counter()
+        self.events: Counter = Counter()
+        self.port: int | None = None
+        self._ws: web.WebSocketResponse | None = None
+        self._runner: web.AppRunner | None = None
+        self._started = time.monotonic()
+
+        self.app = web.Application()
+        self.app.router.add_get("/version", self._version)
+        self.app.router.add_get("/v4/info", self._info)
+        self.app.router.add_get("/v4/websocket", self._websocket)
+        self.app.router.add_get("/v4/loadtracks", self._load_tracks)
+        self.app.router.add_patch("/v4/sessions/{session}", self._update_session)
+        self.app.router.add_get(
+            "/v4/sessions/{session}/players/{guild}", self._get_player
+        )
+        self.app.router.add_patch(
+            "/v4/sessions/{session}/players/{guild}", self._update_player
+        )
+        self.app.router.add_delete(
+            "/v4/sessions/{session}/players/{guild}", self._destroy_player
+        )
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """
+        Start serving and return the port in use.
+        """
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self) -> None:
+        """
+        Stop playback timers, close the websocket and stop serving.
+        """
+        for player in self.players.values():
+            if player.end_task:
+                player.end_task.cancel()
+        if self._ws is not None:
+            await self._ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _delay(self) -> None:
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _authorized(self, request: web.Request) -> bool:
+        return request.headers.get("Authorization") == self.password
+
+    async def _send(self, payload: dict) -> None:
+        if self._ws is None or self._ws.closed:
+            return
+        if payload["op"] == "event":
+            self.events[payload["type"]] += 1
+        await self._ws.send_str(json.dumps(payload))
+
+    def _stats(self) -> dict:
+        return {
+            "op": "stats",
+            "players": len(self.players),
+            "playingPlayers": sum(1 for p in self.players.values() if p.track),
+            "uptime": int((time.monotonic() - self._started) * 1000),
+            "memory": {
+                "free": 1 << 28,
+                "used": 1 << 26,
+                "allocated": 1 << 29,
+                "reservable": 1 << 30,
+            },
+            "cpu": {"cores": 4, "systemLoad": 0.1, "lavalinkLoad": 0.05},
+            "frameStats": None,
+        }
+
+    async def _version(self, request: web.Request) -> web.Response:
+        return web.Response(text="4.0.0")
+
+    async def _info(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "version": {"semver": "4.0.0", "major": 4, "minor": 0, "patch": 0},
+                "buildTime": 0,
+                "git": {"branch": "fake", "commit": "fake", "commitTime": 0},
+                "jvm": "none",
+                "lavaplayer": "none",
+                "sourceManagers": ["soundcloud", "youtube", "http"],
+                "filters": [],
+                "plugins": [],
+            }
+        )
+
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+        if not self._authorized(request):
+            raise web.HTTPUnauthorized()
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._ws = ws
+        await self._send(
+            {"op": "ready", "resumed": False, "sessionId": self.session_id}
+        )
+        await self._send(self._stats())
+        async for message in ws:
+            if message.type == WSMsgType.ERROR:
+                break
+        return ws
+
+    async def _load_tracks(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            raise web.HTTPUnauthorized()
+        self.requests["loadtracks"] += 1
+        await self._delay()
+        identifier = request.query.get("identifier", "")
+
+        if self.random.random() < self.load_failure_rate:
+            return web.json_response(
+                {
+                    "loadType": "error",
+                    "data": {
+                        "message": "Simulated load failure",
+                        "severity": "common",
+                        "cause": "fake_lavalink",
+                    },
+                }
+            )
+
+        prefix, _, terms = identifier.partition(":")
+        if prefix.endswith("search") and terms:
+            tracks = [
+                make_track(f"{prefix}-{terms}-{i}", f"{terms} #{i}", prefix)
+                for i in range(self.search_results)
+            ]
+            return web.json_response({"loadType": "search", "data": tracks})
+
+        path = urlparse(identifier).path.strip("/")
+        if "playlist" in path:
+            tracks = [make_track(f"{path}-{i}", f"{path} track {i}") for i in range(25)]
+            return web.json_response(
+                {
+                    "loadType": "playlist",
+                    "data": {
+                        "info": {"name": path, "selectedTrack": -1},
+                        "pluginInfo": {},
+                        "tracks": tracks,
+                    },
+                }
+            )
+        if path:
+            return web.json_response(
+                {"loadType": "track", "data": make_track(path, path)}
+            )
+        return web.json_response({"loadType": "empty", "data": {}})
+
+    async def _update_session(self, request: web.Request) -> web.Response:
+        self.requests["session"] += 1
+        return web.json_response({"resuming": False, "timeout": 60})
+
+    async def _get_player(self, request: web.Request) -> web.Response:
+        player = self.players.get(request.match_info["guild"])
+        if player is None:
+            raise web.HTTPNotFound()
+        return web.json_response(player.to_dict())
+
+    async def _update_player(self, request: web.Request) -> web.Response:
+        if not self._authorized(request):
+            raise web.HTTPUnauthorized()
+        self.requests["update_player"] += 1
+        await self._delay()
+        guild_id = request.match_info["guild"]
+        player = self.players.setdefault(guild_id, FakePlayer(guild_id))
+        body = await request.json()
+
+        if "voice" in body:
+            player.voice = body["voice"]
+        if "volume" in body:
+            player.volume = body["volume"]
+        if "paused" in body:
+            player.paused = body["paused"]
+        if "track" in body:
+            no_replace = request.query.get("noReplace") == "true"
+            encoded = body["track"].get("encoded")
+            if encoded is None:
+                await self._end(player, "stopped")
+            elif not (no_replace and player.track):
+                await self._end(player, "replaced")
+                track = json.loads(base64.b64decode(encoded))
+                player.track = {
+                    "encoded": encoded,
+                    "info": track,
+                    "pluginInfo": {},
+                    "userData": body["track"].get("userData", {}),
+                }
+                asyncio.create_task(self._start(player))
+        return web.json_response(player.to_dict())
+
+    async def _destroy_player(self, request: web.Request) -> web.Response:
+        self.requests["destroy_player"] += 1
+        player = self.players.pop(request.match_info["guild"], None)
+        if player and player.end_task:
+            player.end_task.cancel()
+        return web.Response(status=204)
+
+    async def _start(self, player: FakePlayer) -> None:
+        await self._delay()
+        track = player.track
+        if track is None:
+            return
+        player.started_at = time.monotonic()
+        await self._send(
+            {
+                "op": "event",
+                "type": "TrackStartEvent",
+                "guildId": player.guild_id,
+                "track": track,
+            }
+        )
+        await self._send(
+            {
+                "op": "playerUpdate",
+                "guildId": player.guild_id,
+                "state": {
+                    "time": int(time.time() * 1000),
+                    "position": 0,
+                    "connected": True,
+                    "ping": 0,
+                },
+            }
+        )
+        player.end_task = asyncio.create_task(self._play(player, track))
+
+    async def _play(self, player: FakePlayer, track: dict) -> None:
+        if self.random.random() < self.track_failure_rate:
+            await asyncio.sleep(self.play_time * self.random.random())
+            await self._send(
+                {
+                    "op": "event",
+                    "type": "TrackExceptionEvent",
+                    "guildId": player.guild_id,
+                    "track": track,
+                    "exception": {
+                        "message": "Simulated playback failure",
+                        "severity": "common",
+                        "cause": "fake_lavalink",
+                    },
+                }
+            )
+            reason = "loadFailed"
+        else:
+            await asyncio.sleep(self.play_time)
+            reason = "finished"
+        if player.track is track:
+            player.end_task = None
+            player.track = None
+            await self._send_end(player, track, reason)
+
+    async def _end(self, player: FakePlayer, reason: str) -> None:
+        """
+        End whatever the player is playing, as a stop or replace does.
+        """
+        track = player.track
+        if track is None:
+            return
+        if player.end_task:
+            player.end_task.cancel()
+            player.end_task = None
+        player.track = None
+        await self._send_end(player, track, reason)
+
+    async def _send_end(self, player: FakePlayer, track: dict, reason: str) -> None:
+        await self._send(
+            {
+                "op": "event",
+                "type": "TrackEndEvent",
+                "guildId": player.guild_id,
+                "track": track,
+                "reason": reason,
+            }
+        )
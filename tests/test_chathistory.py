@@ -0,0 +1,102 @@
+"""
+Tests for ChannelHistories trimming, eviction and summaries.
+"""
+
+import asyncio
+
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    UserPromptPart,
+)
+
+from src.chathistory import ChannelHistories, estimate_tokens
+
+
+def exchange(number: int, words: int = 1) -> list:
+    return [
+        ModelRequest(parts=[UserPromptPart(f"question {number} " * words)]),
+        ModelResponse(parts=[TextPart(f"answer {number} " * words)]),
+    ]
+
+
+def prompts(history: list) -> list[str]:
+    return [
+        part.content.split()[1]
+        for message in history
+        for part in message.parts
+        if isinstance(part, UserPromptPart)
+    ]
+
+
+def test_keeps_at_most_max_per_channel_messages():
+    histories = ChannelHistories(max_per_channel=4, max_total=100, max_tokens=10000)
+    for number in range(5):
+        histories.extend("a", exchange(number))
+    assert prompts(histories.get("a")) == ["3", "4"]
+    assert histories.stats()["messages"] == 4
+    assert histories.trimmed == 6
+
+
+def test_trims_to_the_token_budget_but_keeps_the_newest_exchange():
+    big = exchange(0, words=100)
+    budget = sum(estimate_tokens(message) for message in big)
+    histories = ChannelHistories(max_per_channel=100, max_total=100, max_tokens=budget)
+    histories.extend("a", exchange(1))
+    histories.extend("a", big)
+    # The older exchange goes, the newest stays even though it fills the budget
+    assert histories.get("a") == big
+    assert histories.tokens("a") == budget
+
+    histories.extend("a", exchange(2, words=200))
+    assert prompts(histories.get("a")) == ["2"]
+    assert histories.tokens("a") > budget
+
+
+def test_never_leaves_a_response_at_the_front():
+    histories = ChannelHistories(max_per_channel=3, max_total=100, max_tokens=10000)
+    histories.extend("a", exchange(0))
+    histories.extend("a", exchange(1))
+    history = histories.get("a")
+    assert isinstance(history[0], ModelRequest)
+    assert prompts(history) == ["1"]
+
+
+def test_evicts_least_recently_used_channels_over_max_total():
+    histories = ChannelHistories(max_per_channel=10, max_total=4, max_tokens=10000)
+    histories.extend("a", exchange(0))
+    histories.extend("b", exchange(1))
+    histories.get("a")
+    histories.extend("c", exchange(2))
+    assert histories.get("b") == []
+    assert prompts(histories.get("a")) == ["0"]
+    assert histories.stats()["evictions"] == 1
+    assert histories.total == 4
+
+
+def test_trimmed_messages_are_summarized_in_front():
+    async def scenario():
+        seen = []
+
+        async def summarizer(summary, messages):
+            seen.append(len(messages))
+            return f"{summary or ''}+{len(messages)}"
+
+        histories = ChannelHistories(
+            max_per_channel=2, max_total=100, max_tokens=10000, summarizer=summarizer
+        )
+        for number in range(3):
+            histories.extend("a", exchange(number))
+        while histories._channels["a"].summarizing:
+            await asyncio.sleep(0)
+        return histories.get("a"), seen
+
+    history, seen = asyncio.run(scenario())
+    # Both trims landed before the summarizer ran, so they share one call
+    assert seen == [4]
+    summary = history[0].parts[0]
+    assert isinstance(summary, SystemPromptPart)
+    assert summary.content.endswith("+4")
+    assert prompts(history[1:]) == ["2"]
@@ -0,0 +1,132 @@
+"""
+Tests for answering question mark reactions and the explanation cache.
+"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from src.explanationcache import ExplanationCache
+from src.explanations import ExplanationService
+
+CHANNEL_ID = 1
+MESSAGE_ID = 2
+USER_ID = 3
+
+
+class FakeChat:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_explanation(self, person, message, channel_id, user_id):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return f"explained: {message}"
+
+
+class FakeRest:
+    def __init__(self):
+        self.sent = []
+        self.fetched = 0
+
+    async def create_message(self, channel_id, content, reply=None):
+        self.sent.append((channel_id, content, reply))
+
+    async def fetch_message(self, channel_id, message_id):
+        self.fetched += 1
+        return SimpleNamespace(
+            content="what?", author=SimpleNamespace(display_name="someone")
+        )
+
+
+def make_service() -> ExplanationService:
+    return ExplanationService(SimpleNamespace(rest=FakeRest()), FakeChat())
+
+
+def test_message_is_answered_once_however_many_reactions():
+    async def scenario():
+        service = make_service()
+        service.observe(
+            "MESSAGE_CREATE",
+            {"id": str(MESSAGE_ID), "content": "what?", "author": {"username": "a"}},
+        )
+        # Two reactions together, then one after the answer was posted
+        await asyncio.gather(
+            service.answer(CHANNEL_ID, MESSAGE_ID, USER_ID),
+            service.answer(CHANNEL_ID, MESSAGE_ID, USER_ID),
+        )
+        await service.answer(CHANNEL_ID, MESSAGE_ID, USER_ID)
+        return service
+
+    service = asyncio.run(scenario())
+    assert service.bot.rest.sent == [(CHANNEL_ID, "explained: what?", MESSAGE_ID)]
+    assert service.chat.calls == 1
+    assert service.bot.rest.fetched == 0
+    assert service.joined == 1
+    assert service.repeats == 1
+
+
+def test_edited_message_can_be_answered_again():
+    async def scenario():
+        service = make_service()
+        await service.answer(CHANNEL_ID, MESSAGE_ID, USER_ID)
+        service.observe(
+            "MESSAGE_UPDATE",
+            {"id": str(MESSAGE_ID), "content": "why?", "author": {"username": "a"}},
+        )
+        await service.answer(CHANNEL_ID, MESSAGE_ID, USER_ID)
+        return service
+
+    service = asyncio.run(scenario())
+    assert [sent[1] for sent in service.bot.rest.sent] == [
+        "explained: what?",
+        "explained: why?",
+    ]
+    assert service.bot.rest.fetched == 1
+
+
+def test_close_waits_for_disk_reads_in_progress(tmp_path):
+    async def scenario():
+        cache = ExplanationCache(8, 3600, str(tmp_path / "explanations.db"))
+        await cache.put("key", "explanation")
+        cache.memory.discard("key")
+
+        entered = threading.Event()
+        release = threading.Event()
+        read = cache._read
+
+        def slow_read(conn, key):
+            entered.set()
+            release.wait(1)
+            return read(conn, key)
+
+        cache._read = slow_read
+        lookup = asyncio.create_task(cache.get("key"))
+        await asyncio.to_thread(entered.wait, 1)
+        closing = asyncio.create_task(cache.close())
+        await asyncio.sleep(0.01)
+        assert not closing.done()
+        release.set()
+        await closing
+        # Closed, so lookups no longer touch the database
+        return await lookup, await cache.get("other")
+
+    assert asyncio.run(scenario()) == ("explanation", None)
+
+
+def test_disk_tier_keeps_only_the_newest_rows(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "explanations.db")
+        cache = ExplanationCache(8, 3600, path, max_rows=3)
+        for number in range(5):
+            await cache.put(f"key {number}", f"explanation {number}")
+        await cache.close()
+
+        reopened = ExplanationCache(8, 3600, path, max_rows=3)
+        found = [await reopened.get(f"key {number}") for number in range(5)]
+        await reopened.close()
+        return found, cache.pruned
+
+    found, pruned = asyncio.run(scenario())
+    assert found == [None, None, "explanation 2", "explanation 3", "explanation 4"]
+    assert pruned == 2
@@ -0,0 +1,157 @@
+"""
+Tests for GuildActors.
+"""
+
+import asyncio
+
+import pytest
+
+from src.guildactor import GuildActors
+
+
+def test_operations_in_a_guild_run_in_order_one_at_a_time():
+    async def scenario():
+        actors = GuildActors()
+        running = 0
+        overlapped = False
+        order = []
+
+        def operation(number):
+            async def run():
+                nonlocal running, overlapped
+                running += 1
+                overlapped |= running > 1
+                await asyncio.sleep(0.001)
+                order.append(number)
+                running -= 1
+                return number
+
+            return run
+
+        results = await asyncio.gather(
+            *(actors.run(1, operation(number)) for number in range(10))
+        )
+        return results, order, overlapped
+
+    results, order, overlapped = asyncio.run(scenario())
+    assert results == list(range(10))
+    assert order == list(range(10))
+    assert not overlapped
+
+
+def test_guilds_run_concurrently():
+    async def scenario():
+        actors = GuildActors()
+        started = asyncio.Event()
+
+        async def first():
+            await asyncio.wait_for(started.wait(), 1)
+            return "first"
+
+        async def second():
+            started.set()
+            return "second"
+
+        return await asyncio.gather(actors.run(1, first), actors.run(2, second))
+
+    assert asyncio.run(scenario()) == ["first", "second"]
+
+
+def test_queued_calls_with_the_same_key_share_a_result():
+    async def scenario():
+        actors = GuildActors()
+        calls = 0
+        blocker = asyncio.Event()
+
+        async def block():
+            await blocker.wait()
+
+        async def count():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        first = asyncio.create_task(actors.run(1, block))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(actors.run(1, count, key="k")) for _ in range(3)]
+        await asyncio.sleep(0)
+        blocker.set()
+        await first
+        return await asyncio.gather(*queued), actors.coalesced
+
+    results, coalesced = asyncio.run(scenario())
+    assert results == [1, 1, 1]
+    assert coalesced == 2
+
+
+def test_nested_calls_run_inline():
+    async def scenario():
+        actors = GuildActors()
+
+        async def inner():
+            return "inner"
+
+        async def outer():
+            return await actors.run(1, inner)
+
+        return await asyncio.wait_for(actors.run(1, outer), 1)
+
+    assert asyncio.run(scenario()) == "inner"
+
+
+def test_errors_reach_the_caller_and_the_worker_keeps_going():
+    async def scenario():
+        actors = GuildActors()
+
+        async def fail():
+            raise ValueError("boom")
+
+        async def cancelled_inside():
+            raise asyncio.CancelledError()
+
+        async def ok():
+            return "ok"
+
+        with pytest.raises(ValueError):
+            await actors.run(1, fail)
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(actors.run(1, cancelled_inside), 1)
+        return await asyncio.wait_for(actors.run(1, ok), 1)
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+@pytest.mark.parametrize("delay", [0, 0.01])
+def test_cancelled_worker_settles_running_and_queued_operations(delay):
+    async def scenario():
+        actors = GuildActors()
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        running = asyncio.create_task(actors.run(1, hang))
+        queued = asyncio.create_task(actors.run(1, hang))
+        # Cancel the worker before it starts, and while it runs an operation
+        await asyncio.sleep(delay)
+        actors._actors[1].task.cancel()
+        results = await asyncio.wait_for(
+            asyncio.gather(running, queued, return_exceptions=True), 1
+        )
+        return [type(result) for result in results]
+
+    assert asyncio.run(scenario()) == [asyncio.CancelledError] * 2
+
+
+def test_idle_workers_exit():
+    async def scenario():
+        actors = GuildActors(idle_timeout=0.01)
+
+        async def ok():
+            return "ok"
+
+        await actors.run(1, ok)
+        assert len(actors) == 1
+        await asyncio.sleep(0.05)
+        return len(actors), await actors.run(1, ok)
+
+    assert asyncio.run(scenario()) == (0, "ok")
@@ -0,0 +1,186 @@
+"""
+Tests for HedgedRunner, with stand-in models that answer after a delay.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.hedging import HedgedRunner, LatencyHistogram
+from src.llmscheduler import LLMScheduler
+
+PRIMARY = SimpleNamespace(model_name="primary")
+BACKUP = SimpleNamespace(model_name="backup")
+
+
+def make_runner(scheduler: LLMScheduler | None = None) -> HedgedRunner:
+    return HedgedRunner(
+        [PRIMARY, BACKUP], percentile=0.95, initial_delay=0.02, scheduler=scheduler
+    )
+
+
+def make_call(behaviour: dict, cancelled: list | None = None):
+    """
+    call(model) that waits the model's delay, then answers with its name or
+    raises if its delay is an exception.
+    """
+
+    async def call(model):
+        outcome = behaviour[model.model_name]
+        if isinstance(outcome, Exception):
+            raise outcome
+        try:
+            await asyncio.sleep(outcome)
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(model.model_name)
+            raise
+        return model.model_name
+
+    return call
+
+
+def make_stream(behaviour: dict, chunks: int = 3):
+    """
+    call(model) streaming chunks, first after the model's delay. An
+    exception as the delay fails before the first chunk, a (delay,
+    exception) pair fails after it.
+    """
+
+    async def call(model):
+        outcome = behaviour[model.model_name]
+        if isinstance(outcome, Exception):
+            raise outcome
+        delay, error = outcome if isinstance(outcome, tuple) else (outcome, None)
+        await asyncio.sleep(delay)
+        for i in range(chunks):
+            yield f"{model.model_name} {i}"
+            if error:
+                raise error
+
+    return call
+
+
+async def collect(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def test_histogram_percentile_bucket():
+    histogram = LatencyHistogram()
+    for _ in range(90):
+        histogram.record(0.1)
+    for _ in range(10):
+        histogram.record(5.0)
+    assert 0.1 <= histogram.percentile(0.5) < 0.13
+    assert 5.0 <= histogram.percentile(0.95) < 6.3
+
+
+def test_fast_primary_wins_without_hedging():
+    runner = make_runner()
+    call = make_call({"primary": 0, "backup": 0})
+    assert asyncio.run(runner.run(call)) == "primary"
+    assert runner.hedges == 0
+    assert runner.histograms["primary"].total == 1
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    cancelled = []
+    runner = make_runner()
+    call = make_call({"primary": 1.0, "backup": 0}, cancelled)
+
+    async def scenario():
+        result = await runner.run(call)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == "backup"
+    assert runner.hedges == 1
+    assert runner.wins["backup"] == 1
+    assert cancelled == ["primary"]
+
+
+def test_failing_primary_hands_over_at_once():
+    runner = make_runner()
+    runner.initial_delay = 10
+    call = make_call({"primary": ValueError("down"), "backup": 0})
+    assert asyncio.run(asyncio.wait_for(runner.run(call), 1)) == "backup"
+    assert runner.failures["primary"] == 1
+    assert runner.hedges == 0
+
+
+def test_raises_the_last_error_when_every_model_fails():
+    runner = make_runner()
+    call = make_call({"primary": ValueError("one"), "backup": KeyError("two")})
+    with pytest.raises(KeyError):
+        asyncio.run(runner.run(call))
+
+
+def test_hedges_wait_for_a_free_scheduler_slot():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=1, rate=0, burst=1)
+        runner = make_runner(scheduler)
+        call = make_call({"primary": 0.1, "backup": 0})
+        async with scheduler.slot(0, "user"):
+            result = await runner.run(call)
+        return result, runner, scheduler
+
+    result, runner, scheduler = asyncio.run(scenario())
+    # The only slot was the caller's, so the primary had to answer
+    assert result == "primary"
+    assert runner.hedges == 0
+    assert runner.skipped >= 1
+    assert scheduler.active == 0
+
+
+def test_hedges_hold_their_own_scheduler_slot():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=2, rate=0, burst=2)
+        runner = make_runner(scheduler)
+        active = []
+
+        async def call(model):
+            active.append(scheduler.active)
+            await asyncio.sleep(1.0 if model is PRIMARY else 0)
+            return model.model_name
+
+        async with scheduler.slot(0, "user"):
+            result = await runner.run(call)
+        await asyncio.sleep(0)
+        return result, active, scheduler.active
+
+    result, active, after = asyncio.run(scenario())
+    assert result == "backup"
+    assert active == [1, 2]
+    assert after == 0
+
+
+def test_stream_fails_over_before_the_first_chunk():
+    runner = make_runner()
+    runner.initial_delay = 10
+    call = make_stream({"primary": ValueError("down"), "backup": 0})
+    chunks = asyncio.run(asyncio.wait_for(collect(runner.stream(call)), 1))
+    assert chunks == ["backup 0", "backup 1", "backup 2"]
+    assert runner.first_chunk["backup"].total == 1
+
+
+def test_stream_is_hedged_on_time_to_first_chunk():
+    runner = make_runner()
+    call = make_stream({"primary": 1.0, "backup": 0})
+    chunks = asyncio.run(asyncio.wait_for(collect(runner.stream(call)), 1))
+    assert chunks == ["backup 0", "backup 1", "backup 2"]
+    assert runner.hedges == 1
+
+
+def test_stream_error_after_the_first_chunk_is_raised():
+    runner = make_runner()
+    call = make_stream({"primary": (0, ValueError("cut off")), "backup": 0})
+
+    async def scenario():
+        seen = []
+        with pytest.raises(ValueError):
+            async for chunk in runner.stream(call):
+                seen.append(chunk)
+        return seen
+
+    assert asyncio.run(scenario()) == ["primary 0"]
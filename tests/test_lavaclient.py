@@ -0,0 +1,79 @@
+"""
+Tests for the music client's check of the next track, with lavalink loads
+answered by a stand-in.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import lavalink
+
+from src.lavaclient import MusicClient
+from src.trackqueue import QueueTrack, TrackQueue
+from tests.fake_lavalink import make_track
+
+GUILD_ID = 100
+
+
+def make_item(identifier: str, added_at: float, restored: bool = False) -> QueueTrack:
+    track = lavalink.AudioTrack(make_track(identifier, f"title {identifier}"), 1)
+    return QueueTrack(track, 1, "tester", added_at, restored=restored)
+
+
+def make_client(alive: set[str]) -> tuple[MusicClient, list[str]]:
+    """
+    A client whose lavalink finds only the tracks in alive, and the list of
+    identifiers it was asked to load.
+    """
+    client = MusicClient(SimpleNamespace())
+    loaded = []
+
+    async def get_tracks(query):
+        identifier = query.rsplit("/", 1)[-1]
+        loaded.append(identifier)
+        tracks = (
+            [lavalink.AudioTrack(make_track(identifier, "fresh"), 0)]
+            if identifier in alive
+            else []
+        )
+        return SimpleNamespace(
+            load_type=lavalink.LoadType.TRACK if tracks else lavalink.LoadType.EMPTY,
+            tracks=tracks,
+            error=None,
+        )
+
+    client._get_tracks = get_tracks
+    return client, loaded
+
+
+def test_recently_loaded_tracks_are_not_looked_up():
+    client, loaded = make_client(alive=set())
+    client.queues[GUILD_ID] = TrackQueue([make_item("a", time.time())])
+    asyncio.run(client._prefetch_next(GUILD_ID))
+    assert loaded == []
+    assert len(client.queues[GUILD_ID]) == 1
+
+
+def test_restored_and_old_tracks_are_looked_up_and_dead_ones_dropped():
+    client, loaded = make_client(alive={"c"})
+    queue = TrackQueue(
+        [
+            make_item("a", time.time(), restored=True),
+            make_item("b", time.time() - 2 * client.revalidate_age),
+            make_item("c", time.time(), restored=True),
+            make_item("d", time.time(), restored=True),
+        ]
+    )
+    client.queues[GUILD_ID] = queue
+    asyncio.run(client._prefetch_next(GUILD_ID))
+
+    head = queue.peek()
+    assert loaded == ["a", "b", "c"]
+    assert [item.track.identifier for item in queue] == ["c", "d"]
+    assert head.validated
+    assert head.track.title == "fresh"
+
+    # Already checked, so a second pass does nothing
+    asyncio.run(client._prefetch_next(GUILD_ID))
+    assert loaded == ["a", "b", "c"]
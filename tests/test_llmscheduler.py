@@ -0,0 +1,150 @@
+"""
+Tests for LLMScheduler.
+"""
+
+import asyncio
+
+from src.llmscheduler import (
+    EXPLANATION_PRIORITY,
+    MENTION_PRIORITY,
+    LLMScheduler,
+)
+
+
+async def hold(scheduler, priority, user, order, release):
+    async with scheduler.slot(priority, user):
+        order.append(user)
+        await release.wait()
+
+
+async def run_in_order(scheduler, requests):
+    """
+    Queue requests behind one that holds the only slot, then let them
+    through one at a time and return the order they got the slot in.
+    """
+    order = []
+    release = asyncio.Event()
+    blocker = asyncio.create_task(hold(scheduler, 0, "blocker", [], release))
+    await asyncio.sleep(0)
+    tasks = []
+    for priority, user in requests:
+        tasks.append(
+            asyncio.create_task(hold(scheduler, priority, user, order, release))
+        )
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+    return order
+
+
+def test_concurrency_cap():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=2, rate=0, burst=1)
+        running = 0
+        peak = 0
+
+        async def request():
+            nonlocal running, peak
+            async with scheduler.slot(MENTION_PRIORITY, 1):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.001)
+                running -= 1
+
+        await asyncio.gather(*(request() for _ in range(10)))
+        return peak, scheduler.stats()
+
+    peak, stats = asyncio.run(scenario())
+    assert peak == 2
+    assert stats["active"] == 0
+    assert stats["granted"] == 10
+
+
+def test_priority_then_round_robin_between_users():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=1, rate=0, burst=1)
+        return await run_in_order(
+            scheduler,
+            [
+                (EXPLANATION_PRIORITY, "explainer"),
+                (MENTION_PRIORITY, "spammer"),
+                (MENTION_PRIORITY, "spammer"),
+                (MENTION_PRIORITY, "spammer"),
+                (MENTION_PRIORITY, "other"),
+            ],
+        )
+
+    order = asyncio.run(scenario())
+    assert order == ["spammer", "other", "spammer", "spammer", "explainer"]
+
+
+def test_rate_limit_spaces_out_requests():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=10, rate=100, burst=2)
+        loop = asyncio.get_running_loop()
+        started = []
+
+        async def request():
+            async with scheduler.slot(MENTION_PRIORITY, 1):
+                started.append(loop.time())
+
+        begin = loop.time()
+        await asyncio.gather(*(request() for _ in range(5)))
+        return [time - begin for time in started]
+
+    started = asyncio.run(scenario())
+    # Two from the burst straight away, then one every 10ms
+    assert started[1] < 0.005
+    assert started[4] >= 0.025
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=1, rate=0, burst=1)
+        release = asyncio.Event()
+        blocker = asyncio.create_task(hold(scheduler, 0, 1, [], release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold(scheduler, 0, 2, [], release))
+        await asyncio.sleep(0)
+        assert scheduler.depth == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        depth = scheduler.depth
+        release.set()
+        await blocker
+        return depth, scheduler.active
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+def test_try_acquire_only_takes_free_capacity():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=2, rate=0, burst=1)
+        release = asyncio.Event()
+        blocker = asyncio.create_task(hold(scheduler, 0, 1, [], release))
+        await asyncio.sleep(0)
+        first = scheduler.try_acquire()
+        # The cap is reached, extra requests don't queue
+        second = scheduler.try_acquire()
+        waiter = asyncio.create_task(hold(scheduler, 0, 2, [], release))
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.sleep(0)
+        # The freed slot went to the waiting request, not another extra
+        third = scheduler.try_acquire()
+        release.set()
+        await asyncio.gather(blocker, waiter)
+        return first, second, third, scheduler.stats()
+
+    first, second, third, stats = asyncio.run(scenario())
+    assert (first, second, third) == (True, False, False)
+    assert stats["extra"] == 1
+    assert stats["active"] == 0
+
+
+def test_try_acquire_spends_rate_tokens():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrent=10, rate=0.001, burst=1)
+        return scheduler.try_acquire(), scheduler.try_acquire()
+
+    assert asyncio.run(scenario()) == (True, False)
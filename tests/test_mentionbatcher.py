@@ -0,0 +1,53 @@
+"""
+Tests for MentionBatcher.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from src.mentionbatcher import MentionBatcher
+
+
+def make_message(channel_id: int, number: int) -> SimpleNamespace:
+    return SimpleNamespace(channel_id=channel_id, number=number)
+
+
+def test_first_mention_is_answered_without_waiting():
+    async def scenario():
+        handled = asyncio.Event()
+
+        async def handler(batch):
+            handled.set()
+
+        batcher = MentionBatcher(10, handler)
+        batcher.submit(make_message(1, 0))
+        await asyncio.wait_for(handled.wait(), 0.05)
+
+    asyncio.run(scenario())
+
+
+def test_mentions_during_a_call_are_batched_up_to_max_batch():
+    async def scenario():
+        batches = []
+        release = asyncio.Event()
+
+        async def handler(batch):
+            batches.append([message.number for message in batch])
+            await release.wait()
+
+        batcher = MentionBatcher(3, handler)
+        batcher.submit(make_message(1, 0))
+        await asyncio.sleep(0)
+        for number in range(1, 6):
+            batcher.submit(make_message(1, number))
+        # Another channel isn't held up by the busy one
+        batcher.submit(make_message(2, 100))
+        await asyncio.sleep(0)
+        release.set()
+        while batcher._workers:
+            await asyncio.sleep(0)
+        return batches, batcher.stats()
+
+    batches, stats = asyncio.run(scenario())
+    assert batches == [[0], [100], [1, 2, 3], [4, 5]]
+    assert stats == {"mentions": 7, "batches": 4, "largest": 3}
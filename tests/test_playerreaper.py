@@ -0,0 +1,63 @@
+"""
+Tests for the timers that decide when PlayerReaper reclaims a player.
+"""
+
+from types import SimpleNamespace
+
+from src import playerreaper
+from src.playerreaper import PlayerReaper
+
+GUILD_ID = 100
+
+
+def make_reaper(listeners: int) -> PlayerReaper:
+    reaper = PlayerReaper(
+        client=None, idle_timeout=300, paused_timeout=3600, empty_timeout=60
+    )
+    reaper._listener_count = lambda guild_id, channel_id: listeners
+    return reaper
+
+
+def make_player(playing: bool, paused: bool = False) -> SimpleNamespace:
+    return SimpleNamespace(is_playing=playing, paused=paused, channel_id=1)
+
+
+def test_paused_player_with_listeners_outlasts_idle_timeout(monkeypatch):
+    reaper = make_reaper(listeners=2)
+    player = make_player(playing=True, paused=True)
+    monkeypatch.setattr(playerreaper.time, "monotonic", lambda: 0)
+    assert reaper._reap_reason(GUILD_ID, player) is None
+    monkeypatch.setattr(playerreaper.time, "monotonic", lambda: 1000)
+    assert reaper._reap_reason(GUILD_ID, player) is None
+    monkeypatch.setattr(playerreaper.time, "monotonic", lambda: 3600)
+    assert reaper._reap_reason(GUILD_ID, player).startswith("paused")
+
+
+def test_stopped_player_is_reaped_after_idle_timeout(monkeypatch):
+    reaper = make_reaper(listeners=2)
+    player = make_player(playing=False)
+    monkeypatch.setattr(playerreaper.time, "monotonic", lambda: 0)
+    assert reaper._reap_reason(GUILD_ID, player) is None
+    monkeypatch.setattr(playerreaper.time, "monotonic", lambda: 300)
+    assert reaper._reap_reason(GUILD_ID, player).startswith("nothing played")
+
+
+def test_resuming_resets_the_paused_timer(monkeypatch):
+    reaper = make_reaper(listeners=2)
+    monkeypatch.setattr(playerreaper.time, "monotonic", lambda: 0)
+    reaper._reap_reason(GUILD_ID, make_player(playing=True, paused=True))
+    monkeypatch.setattr(playerreaper.time, "monotonic", lambda: 3000)
+    reaper._reap_reason(GUILD_ID, make_player(playing=True))
+    assert reaper.stats()["paused"] == 0
+    monkeypatch.setattr(playerreaper.time, "monotonic", lambda: 4000)
+    paused = make_player(playing=True, paused=True)
+    assert reaper._reap_reason(GUILD_ID, paused) is None
+
+
+def test_paused_player_without_listeners_is_reaped(monkeypatch):
+    reaper = make_reaper(listeners=0)
+    player = make_player(playing=True, paused=True)
+    monkeypatch.setattr(playerreaper.time, "monotonic", lambda: 0)
+    assert reaper._reap_reason(GUILD_ID, player) is None
+    monkeypatch.setattr(playerreaper.time, "monotonic", lambda: 60)
+    assert reaper._reap_reason(GUILD_ID, player).startswith("no listeners")
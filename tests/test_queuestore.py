@@ -0,0 +1,124 @@
+"""
+Tests for QueueStore, against a database in a temporary directory.
+"""
+
+import asyncio
+import threading
+
+import lavalink
+
+from src.queuestore import GuildSnapshot, QueueStore, restore_queue
+from src.trackqueue import QueueTrack
+from tests.fake_lavalink import make_track
+
+GUILD_ID = 100
+
+
+def make_item(identifier: str) -> QueueTrack:
+    track = lavalink.AudioTrack(make_track(identifier, f"title {identifier}"), 1)
+    return QueueTrack(track, requester_id=1, requester_name="tester", added_at=1.0)
+
+
+class State:
+    """
+    The music state the store is saving, with a build() counter.
+    """
+
+    def __init__(self):
+        self.snapshots: dict[int, GuildSnapshot] = {}
+        self.built: list[int] = []
+
+    def build(self, guild_id: int) -> GuildSnapshot:
+        self.built.append(guild_id)
+        return self.snapshots[guild_id]
+
+
+def test_save_writes_only_changed_guilds(tmp_path):
+    async def scenario():
+        store = QueueStore(str(tmp_path / "queues.db"))
+        state = State()
+        state.snapshots[GUILD_ID] = GuildSnapshot(
+            GUILD_ID, channel_id=5, tracks=[make_item("a"), make_item("b")]
+        )
+        assert await store.save({GUILD_ID: (1,)}, state.build) == 1
+        assert await store.save({GUILD_ID: (1,)}, state.build) == 0
+        assert await store.save({GUILD_ID: (2,)}, state.build) == 1
+        assert state.built == [GUILD_ID, GUILD_ID]
+        snapshots = store.load()
+        await store.close({GUILD_ID: (2,)}, state.build)
+        return snapshots
+
+    (snapshot,) = asyncio.run(scenario())
+    assert snapshot.channel_id == 5
+    assert [item.track.identifier for item in snapshot.tracks] == ["a", "b"]
+
+
+def test_position_alone_is_updated_without_a_rebuild(tmp_path):
+    path = str(tmp_path / "queues.db")
+
+    async def scenario():
+        store = QueueStore(path)
+        state = State()
+        state.snapshots[GUILD_ID] = GuildSnapshot(
+            GUILD_ID, channel_id=5, position=5000, now_playing=make_item("a")
+        )
+        await store.save({GUILD_ID: (1,)}, state.build, {GUILD_ID: 5000})
+        assert await store.save({GUILD_ID: (1,)}, state.build, {GUILD_ID: 5000}) == 0
+        assert await store.save({GUILD_ID: (1,)}, state.build, {GUILD_ID: 60000}) == 1
+        # Same marker, but the position moved on before shutdown
+        await store.close({GUILD_ID: (1,)}, state.build, {GUILD_ID: 180000})
+        return state.built
+
+    assert asyncio.run(scenario()) == [GUILD_ID]
+    (snapshot,) = QueueStore(path).load()
+    assert snapshot.position == 180000
+    queue = restore_queue(snapshot)
+    assert queue.peek().track.identifier == "a"
+    assert queue.peek().start_position == 180000
+
+
+def test_guilds_without_state_are_removed(tmp_path):
+    async def scenario():
+        store = QueueStore(str(tmp_path / "queues.db"))
+        state = State()
+        state.snapshots[GUILD_ID] = GuildSnapshot(GUILD_ID, tracks=[make_item("a")])
+        await store.save({GUILD_ID: (1,)}, state.build)
+        assert await store.save({}, state.build) == 1
+        snapshots = store.load()
+        await store.close({}, state.build)
+        return snapshots
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_close_waits_for_the_save_loop_write(tmp_path):
+    async def scenario():
+        store = QueueStore(str(tmp_path / "queues.db"), save_interval=0)
+        state = State()
+        state.snapshots[GUILD_ID] = GuildSnapshot(GUILD_ID, tracks=[make_item("a")])
+        entered = threading.Event()
+        release = threading.Event()
+        writing = 0
+        overlapped = False
+        write = store._write
+
+        def slow_write(*args):
+            nonlocal writing, overlapped
+            writing += 1
+            overlapped |= writing > 1
+            entered.set()
+            release.wait(1)
+            write(*args)
+            writing -= 1
+
+        store._write = slow_write
+        store.start(lambda: {GUILD_ID: (1,)}, state.build, dict)
+        await asyncio.to_thread(entered.wait, 1)
+        closing = asyncio.create_task(store.close({GUILD_ID: (2,)}, state.build))
+        await asyncio.sleep(0.01)
+        assert not closing.done()
+        release.set()
+        await closing
+        return overlapped
+
+    assert asyncio.run(scenario()) is False
@@ -0,0 +1,66 @@
+"""
+Tests for ReadinessWaiter and the lavalink events that wake it.
+"""
+
+import asyncio
+
+import lavalink
+
+from src.lavaclient import MusicClient, MusicPlayer
+from src.readiness import ReadinessWaiter
+
+
+def test_wait_returns_at_once_when_ready():
+    async def scenario():
+        waiter = ReadinessWaiter()
+        return await waiter.wait("nodes", lambda: True, timeout=0)
+
+    assert asyncio.run(scenario())
+
+
+def test_notify_wakes_waiter_once_ready():
+    async def scenario():
+        waiter = ReadinessWaiter()
+        ready = False
+        task = asyncio.create_task(waiter.wait("nodes", lambda: ready, timeout=5))
+        await asyncio.sleep(0)
+        # A notification before the condition holds keeps it waiting
+        waiter.notify("nodes")
+        await asyncio.sleep(0)
+        assert not task.done()
+        ready = True
+        waiter.notify("nodes")
+        return await asyncio.wait_for(task, 1)
+
+    assert asyncio.run(scenario())
+
+
+def test_wait_times_out_and_cleans_up():
+    async def scenario():
+        waiter = ReadinessWaiter()
+        result = await waiter.wait(123, lambda: False, timeout=0.01)
+        return result, waiter._waiters
+
+    result, waiters = asyncio.run(scenario())
+    assert result is False
+    assert waiters == {}
+
+
+def test_node_and_track_listeners_are_registered():
+    async def scenario():
+        client = lavalink.Client(user_id=1, player=MusicPlayer)
+        try:
+            client.add_event_hooks(MusicClient(None))
+            return {
+                event: [hook.__name__ for hook in hooks]
+                for event, hooks in client._event_hooks.items()
+            }
+        finally:
+            await client.close()
+
+    hooks = asyncio.run(scenario())
+    assert hooks["NodeReadyEvent"] == ["on_node_ready"]
+    assert hooks["NodeConnectedEvent"] == ["on_node_ready"]
+    assert hooks["NodeDisconnectedEvent"] == ["on_node_disconnected"]
+    assert hooks["TrackStartEvent"] == ["on_track_start"]
+    assert hooks["TrackEndEvent"] == ["on_track_end"]
@@ -0,0 +1,114 @@
+"""
+Tests for TrackQueue, checked against a plain list doing the same edits.
+"""
+
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from src.trackqueue import QueueTrack, TrackQueue
+
+
+def make_item(number: int, duration: int = 1000) -> QueueTrack:
+    track = SimpleNamespace(title=f"track {number}", duration=duration)
+    return QueueTrack(track, requester_id=1, requester_name="tester", added_at=0.0)
+
+
+def assert_matches(queue: TrackQueue, expected: list[QueueTrack]) -> None:
+    assert len(queue) == len(expected)
+    assert list(queue) == expected
+    assert queue.total_duration == sum(item.track.duration for item in expected)
+
+
+def test_append_popleft_order():
+    queue = TrackQueue()
+    items = [make_item(i) for i in range(200)]
+    queue.extend(items)
+    assert_matches(queue, items)
+    assert [queue.popleft() for _ in range(200)] == items
+    assert not queue
+    with pytest.raises(IndexError):
+        queue.popleft()
+
+
+def test_appendleft_and_peek():
+    queue = TrackQueue()
+    items = [make_item(i) for i in range(100)]
+    for item in items:
+        queue.appendleft(item)
+    assert queue.peek() is items[-1]
+    assert_matches(queue, items[::-1])
+
+
+def test_insert_matches_list_insert_for_any_index():
+    for index in (-1000, -3, -1, 0, 1, 5, 10, 1000):
+        queue = TrackQueue([make_item(i) for i in range(10)])
+        expected = list(queue)
+        item = make_item(99)
+        queue.insert(index, item)
+        expected.insert(index, item)
+        assert_matches(queue, expected)
+
+
+def test_pop_by_index_and_out_of_range():
+    items = [make_item(i) for i in range(150)]
+    queue = TrackQueue(items)
+    expected = list(items)
+    for index in (-1, 70, 0, -150 + 3, 40):
+        assert queue.pop(index) is expected.pop(index)
+    assert_matches(queue, expected)
+    with pytest.raises(IndexError):
+        queue.pop(len(queue))
+    with pytest.raises(IndexError):
+        queue.pop(-len(queue) - 1)
+
+
+def test_random_edits_match_list():
+    rng = random.Random(1234)
+    queue = TrackQueue()
+    expected: list[QueueTrack] = []
+    for number in range(5000):
+        op = rng.random()
+        if op < 0.35 or not expected:
+            item = make_item(number, rng.randint(1, 500))
+            index = rng.randint(-len(expected) - 5, len(expected) + 5)
+            queue.insert(index, item)
+            expected.insert(index, item)
+        elif op < 0.55:
+            item = make_item(number, rng.randint(1, 500))
+            queue.append(item)
+            expected.append(item)
+        elif op < 0.85:
+            index = rng.randrange(-len(expected), len(expected))
+            assert queue.pop(index) is expected.pop(index)
+        else:
+            assert queue.popleft() is expected.pop(0)
+        if number % 250 == 0:
+            assert_matches(queue, expected)
+            start = rng.randint(0, len(expected))
+            stop = rng.randint(start, len(expected))
+            assert queue[start:stop] == expected[start:stop]
+            if expected:
+                index = rng.randrange(-len(expected), len(expected))
+                assert queue[index] is expected[index]
+    assert_matches(queue, expected)
+
+
+def test_removals_from_the_middle_merge_blocks():
+    queue = TrackQueue([make_item(i) for i in range(64 * 20)])
+    while len(queue) > 200:
+        queue.pop(len(queue) // 2)
+    # Every block but possibly the ends is at least half full
+    assert len(queue._blocks) <= 200 // (TrackQueue.BLOCK_SIZE // 2) + 2
+
+
+def test_version_and_replace_track():
+    item = make_item(1, 1000)
+    queue = TrackQueue([item])
+    version = queue.version
+    queue.replace_track(item, SimpleNamespace(duration=2500))
+    assert queue.total_duration == 2500
+    assert queue.version > version
+    queue.clear()
+    assert_matches(queue, [])